@@ -0,0 +1,138 @@
+"""
+Offline regression benchmark over recorded WITS traffic.
+
+    python benchmark.py record                 # drive live WITS, save HAR archives
+    python benchmark.py run [--label REV]      # replay the archives, save step timings
+    python benchmark.py compare BASE NEW       # per-step latency of two labels
+    python benchmark.py startup [--label REV]  # time from process start to the first browser action
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from src.utils.config import load_config
+from src.utils.timing import StepTimer, load_timings, percentile
+
+BENCH_DIR = Path('output') / 'bench'
+
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return 'worktree'
+
+
+def run_stages(config, har_mode, label):
+    from main import run
+
+    har = config['browser_settings'].setdefault('har', {})
+    har['mode'] = har_mode
+    if har_mode == 'record':
+        # A recording is numbered per context; drop the archives of the last one.
+        for archive in Path(har.get('dir', 'output/har')).glob('*.har'):
+            archive.unlink()
+    # Record and replay both start from empty progress files and a fixed
+    # query order, so the replayed cycle issues the same requests.
+    state_dir = BENCH_DIR / label / 'state'
+    shutil.rmtree(state_dir, ignore_errors=True)
+    config['output_dir'] = str(state_dir)
+    config['workflow']['shuffle_queries'] = False
+    timings_path = BENCH_DIR / f"{label}.jsonl"
+    if timings_path.exists():
+        timings_path.unlink()
+    config['benchmark'] = {'timings_path': str(timings_path), 'label': label}
+    run(config)
+    print(f"Step timings written to {timings_path}")
+
+
+def startup(label, runs):
+    """
+    Starts `main.py` `runs` times and times each process up to its first
+    browser action, where the startup probe ends it. The first run may pay
+    for a cold config snapshot; the rest are what run.py's restarts see.
+    Results go to <label>-startup.jsonl (compare with `compare A-startup B-startup`).
+    """
+    timings_path = BENCH_DIR / f"{label}-startup.jsonl"
+    if timings_path.exists():
+        timings_path.unlink()
+    timer = StepTimer(timings_path, label)
+    probe_path = BENCH_DIR / 'startup_probe.json'
+    env = dict(os.environ, WITS_STARTUP_PROBE=str(probe_path.resolve()))
+
+    durations = []
+    for i in range(runs):
+        if probe_path.exists():
+            probe_path.unlink()
+        started = time.time()
+        subprocess.run([sys.executable, 'main.py'], env=env, stdout=subprocess.DEVNULL, timeout=300)
+        if not probe_path.exists():
+            print(f"Run {i + 1}: main.py exited before its first browser action")
+            continue
+        with open(probe_path, 'r', encoding='utf-8') as f:
+            probe = json.load(f)
+        duration = probe['ts'] - started
+        timer.record('time_to_first_action', duration, run=i, action=probe['action'], cold=(i == 0))
+        durations.append(duration)
+
+    if durations:
+        print(f"time to first action over {len(durations)} runs: "
+              f"p50 {percentile(durations, 50):.3f}s, p95 {percentile(durations, 95):.3f}s, first {durations[0]:.3f}s")
+        print(f"Startup timings written to {timings_path}")
+
+
+def compare(base_label, new_label):
+    base = load_timings(BENCH_DIR / f"{base_label}.jsonl")
+    new = load_timings(BENCH_DIR / f"{new_label}.jsonl")
+
+    header = f"{'step':<28}{'n':>5}{'base p50':>11}{'new p50':>11}{'base p95':>11}{'new p95':>11}{'delta':>9}"
+    print(header)
+    print("-" * len(header))
+    for step in sorted(set(base) | set(new)):
+        b, n = base.get(step, []), new.get(step, [])
+        b50, n50 = percentile(b, 50), percentile(n, 50)
+        b95, n95 = percentile(b, 95), percentile(n, 95)
+        delta = f"{(n50 - b50) / b50 * 100:+.1f}%" if b50 and n50 is not None else "n/a"
+        fmt = lambda v: f"{v:.3f}s" if v is not None else "-"
+        print(f"{step:<28}{len(n):>5}{fmt(b50):>11}{fmt(n50):>11}{fmt(b95):>11}{fmt(n95):>11}{delta:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='config.yaml')
+    sub = parser.add_subparsers(dest='command', required=True)
+    rec = sub.add_parser('record', help='Run the enabled workflow stages against WITS and record HAR archives')
+    rec.add_argument('--label', default='recording')
+    rep = sub.add_parser('run', help='Replay the HAR archives and record per-step timings')
+    rep.add_argument('--label', default=None)
+    cmp_ = sub.add_parser('compare', help='Compare per-step latency between two labels')
+    cmp_.add_argument('base')
+    cmp_.add_argument('new')
+    st = sub.add_parser('startup', help='Time main.py from process start to its first browser action')
+    st.add_argument('--label', default=None)
+    st.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        compare(args.base, args.new)
+        return
+    if args.command == 'startup':
+        BENCH_DIR.mkdir(parents=True, exist_ok=True)
+        startup(args.label or git_revision(), args.runs)
+        return
+
+    config = load_config(args.config)
+    if args.command == 'record':
+        run_stages(config, 'record', args.label)
+    else:
+        run_stages(config, 'replay', args.label or git_revision())
+
+
+if __name__ == '__main__':
+    main()
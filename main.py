@@ -1,19 +1,130 @@
-from src.bots.execute_query import ExecuteQueryBot
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+
 from src.utils.config import load_config
-from src.bots.download_query import DownloadQueryBot
 
-import pdb
+# The bots (and Playwright behind them) are imported only by the stage that
+# runs, which keeps restarts short.
+
+def run_execute_stage(config, submissions=None):
+    from src.bots.execute_query import ExecuteQueryBot
+
+    bot = ExecuteQueryBot(config, submissions=submissions)
+    bot.execute()
+
+def run_download_stage(config, submissions):
+    from src.bots.download_query import DownloadQueryBot
+
+    bot = DownloadQueryBot(config)
+    bot.watch(submissions)
+
+def run_execute_jobs(config, submissions=None):
+    from src.bots.execute_query import ExecuteQueryBot
+    from src.utils.manifest import JobManifest
+
+    bot = ExecuteQueryBot(config)
+    bot.execute_jobs(JobManifest(config, 'execute', bot.logger))
+
+def run_download_jobs(config, submissions=None):
+    from src.bots.download_query import DownloadQueryBot
+    from src.utils.manifest import JobManifest
+
+    bot = DownloadQueryBot(config)
+    bot.download_jobs(JobManifest(config, 'download', bot.logger))
+
+def run_pipeline_worker(stage, config, submissions, parent_pid):
+    """Runs one pipeline stage and ends it when main.py goes away, also after a SIGKILL."""
+    # A forked worker inherits run_pipeline's SIGTERM handler.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    def watch_parent():
+        while os.getppid() == parent_pid:
+            time.sleep(5)
+        os._exit(1)
+
+    threading.Thread(target=watch_parent, daemon=True).start()
+    stage(config, submissions)
+
+def run_pipeline(config, stages=(run_execute_stage, run_download_stage)):
+    """
+    Runs the stages as separate processes connected by a submission queue.
+    run.py restarts main.py with SIGTERM, so the workers are stopped with it
+    instead of outliving it next to the pair the restart launches.
+    """
+    submissions = multiprocessing.Queue()
+    parent_pid = os.getpid()
+    workers = [
+        multiprocessing.Process(target=run_pipeline_worker, args=(stage, config, submissions, parent_pid), name=stage.__name__)
+        for stage in stages
+    ]
+
+    def stop_workers(signum, frame):
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join(timeout=30)
+        sys.exit(0)
+
+    previous = signal.signal(signal.SIGTERM, stop_workers)
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+def run_manifest(config):
+    """
+    Consumes the JSONL job manifest. Each stage tails the manifest, so with
+    both enabled they run side by side as pipeline workers.
+    """
+    stages = []
+    if config['workflow'].get('execute_query', False):
+        stages.append(run_execute_jobs)
+    if config['workflow'].get('download_query', False):
+        stages.append(run_download_jobs)
+
+    if len(stages) > 1:
+        run_pipeline(config, stages)
+    elif stages:
+        stages[0](config)
+
+def run(config):
+    if (config.get('manifest') or {}).get('path'):
+        if config['workflow'].get('pipeline', False):
+            raise ValueError(
+                "manifest.path and workflow.pipeline are mutually exclusive: "
+                "the pipeline works through query_name, the manifest through its jobs."
+            )
+        run_manifest(config)
+        return
+
+    if config['workflow'].get('pipeline', False):
+        run_pipeline(config)
+        return
 
-def main():
-    # Load configuration
-    config = load_config('config.yaml')
-    
     if config['workflow'].get('execute_query', False):
+        from src.bots.execute_query import ExecuteQueryBot
+
         bot = ExecuteQueryBot(config)
         bot.execute()
 
     if config['workflow'].get('download_query', False):
+        from src.bots.download_query import DownloadQueryBot
+
         bot = DownloadQueryBot(config)
         bot.execute()
+
+def main():
+    # Load configuration
+    config = load_config('config.yaml')
+    run(config)
+
 if __name__=='__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,51 @@
+"""
+Throughput and ETA report over the progress files in output/.
+
+    python report.py            # human-readable table
+    python report.py --json     # one JSON document, for dashboards / cron
+"""
+import argparse
+import json
+
+from src.utils.config import load_config
+from src.utils.progress import build_report
+
+
+def print_table(report):
+    print(f"WITS progress at {report['generated_at']}")
+    print(f"\n{'query':<12}{'done':>8}{'failed':>8}{'remaining':>11}")
+    for query_name, counts in sorted(report['queries'].items()):
+        print(f"{query_name:<12}{counts['done']:>8}{counts['failed']:>8}{counts['remaining']:>11}")
+
+    execute = report['execute']
+    print(f"{'total':<12}{execute['done']:>8}{execute['failed']:>8}{execute['remaining']:>11}")
+    rates = ", ".join(f"{k}: {v}/h" for k, v in execute['rate_per_hour'].items())
+    print(f"\nExecute rate  {rates}")
+    print(f"Execute ETA   {execute['eta'] or 'unknown (no recent progress)'}")
+
+    download = report['download']
+    rates = ", ".join(f"{k}: {v}/h" for k, v in download['rate_per_hour'].items())
+    print(f"\nDownload      done {download['done']}, skipped {download['skipped']}, failed {download['failed']}")
+    print(f"Download rate {rates}")
+
+    if report['hosts_last_hour']:
+        print("\nPer-host completions (last hour)")
+        for host, counts in sorted(report['hosts_last_hour'].items()):
+            print(f"  {host:<24}" + ", ".join(f"{status} {n}" for status, n in sorted(counts.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--json', action='store_true', help='Emit the report as JSON')
+    args = parser.parse_args()
+
+    report = build_report(load_config(args.config))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(report)
+
+
+if __name__ == '__main__':
+    main()
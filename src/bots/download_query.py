@@ -1,10 +1,23 @@
+import json
 import os
+import queue
+import time
 from pathlib import Path
 import random
 from src.utils.browser import BrowserManager
 from src.utils.config import load_config
-from src.utils.logger import setup_logger
+from src.utils.logger import setup_logger, log_context, CHATTY
 from src.utils.login import Login
+from src.utils.timing import timer_from_config
+from src.utils.tracing import TraceSampler
+from src.utils.progress import record_event
+from src.utils.memory import MemoryMonitor
+from src.utils.circuit import CircuitBreaker
+from src.utils.session import SessionGuard
+from src.utils.capture import configure_capture, capture_failure
+from src.utils.timeouts import configure_timeouts, measure, timeout_for
+from src.utils.leases import LeaseManager
+from src.utils.filelock import append_lines
 
 from src.wits.navigation import navigate_to_results 
 from src.wits.navigation import ensure_popup_closed, setup_auto_close_popup
@@ -13,41 +26,42 @@ from src.wits.navigation import ensure_popup_closed, setup_auto_close_popup
 class DownloadQueryBot:
     def __init__(self, config):
         self.config = config
-        self.logger = setup_logger("DownloadQuery")
-        self.browser_manager = BrowserManager(config)
+        self.logger = setup_logger("DownloadQuery", config=config)
+        self.browser_manager = BrowserManager(config, name='download')
+        self.timer = timer_from_config(config)
+        self.tracer = TraceSampler(config, self.logger)
+        self.memory = MemoryMonitor(config, self.logger)
+        self.breaker = CircuitBreaker(config, self.logger)
+        self.session = SessionGuard(config, self.logger, login=self.login)
+        configure_timeouts(config)
+        configure_capture(config, self.logger)
+        self.leases = LeaseManager(config, self.logger)
+        self.max_retries = int((config.get('download') or {}).get('max_retries', 3))
         self.browser = None
         self.page = None
         self.setup_dirs()
         
-    def load_done_info(self):
-        file_path = self.download_dir / 'done_pages.txt'
-        if not file_path.exists():
-            self.current_page = 1
-            return
-
-        with open(file_path, 'r') as f:
-            page_no = f.read().splitlines()
-        if page_no:
-            self.current_page = int(page_no[-1])
-        else:
-            self.current_page = 1
-            
     def setup_dirs(self):
         self.logger.info("Setting up directories...")
         cur_dir = os.getcwd()
-        output_dir = Path(cur_dir) / 'output' / 'download'
+        output_dir = Path(cur_dir) / self.config.get('output_dir', 'output') / 'download'
         output_dir.mkdir(parents=True, exist_ok=True)
         self.download_dir = output_dir
 
     def start_browser(self):
         self.logger.info("Starting browser...")
-        self.browser_manager = BrowserManager(self.config)
+        self.browser_manager = BrowserManager(self.config, name='download')
         self.page = self.browser_manager.start()
+        self.page.on("dialog", self.handle_dialog)
+        self.session.attach(self.page)
     
     def login(self):
         self.logger.info("Performing login...")
-        login_manager = Login(self.page, self.config)
-        if login_manager.perform_login():
+        login_manager = Login(self.page, self.config, self.logger)
+        with self.timer.step('login') as outcome:
+            outcome['ok'] = login_manager.perform_login()
+        if outcome['ok']:
+            self.session.mark_logged_in()
             self.logger.info("Login successful.")
             return True
 
@@ -56,6 +70,19 @@ class DownloadQueryBot:
         self.dialog_handled = True
         return True
 
+    def check_memory(self):
+        """Recycles the page or context once the memory monitor reports growth."""
+        action = self.memory.check(self.page)
+        if action is None:
+            return
+        self.logger.warning(f"   [MEMORY] Threshold exceeded. Recycling browser {action}...")
+        if action == 'context':
+            self.page = self.browser_manager.recycle_context()
+        else:
+            self.page = self.browser_manager.recycle_page()
+        self.page.on("dialog", self.handle_dialog)
+        self.session.attach(self.page)
+
     def _get_visible_pages(self):
         try:
             grid_id = "MainContent_QueryViewControl1_grdvQueryList"
@@ -151,9 +178,9 @@ class DownloadQueryBot:
 
     def _handle_pagination(self, current_page):
         try:
-            self.logger.info(f"Navigating to page: {current_page}")
+            self.logger.info(f"Navigating to page: {current_page}", extra=CHATTY)
             if current_page == 1:
-                self.logger.info("Already on page 1")
+                self.logger.info("Already on page 1", extra=CHATTY)
                 return True
             
             # Determine how many windows to advance
@@ -171,7 +198,7 @@ class DownloadQueryBot:
                     self.logger.error("No visible pages found during pagination.")
                     return False
                 
-                self.logger.info(f"Visible pages: {visible_pages}")
+                self.logger.info(f"Visible pages: {visible_pages}", extra=CHATTY)
                 
                 if current_page in visible_pages:
                     # Click the page
@@ -228,7 +255,7 @@ class DownloadQueryBot:
                     
     
     def _get_download_targets(self):
-        self.logger.info("Getting download targets...")
+        self.logger.info("Getting download targets...", extra=CHATTY)
         ensure_popup_closed(self.page, self.logger)
         setup_auto_close_popup(self.page, self.logger)
 
@@ -247,18 +274,16 @@ class DownloadQueryBot:
 
     def _handle_download_popup(self, download_icon, target):
         try:
-            self.logger.info("Handling download popup...")
+            self.logger.info("Handling download popup...", extra=CHATTY)
             ensure_popup_closed(self.page, self.logger)
             setup_auto_close_popup(self.page, self.logger)
             
             # Reset flag
             self.dialog_handled = False
             
-            # Setup dialog handler for potential alerts
-            self.page.on("dialog", self.handle_dialog)
 
             download_icon.click(force=True)
-            self.logger.info("Clicked download icon.")
+            self.logger.info("Clicked download icon.", extra=CHATTY)
             
             # ---------------------------------------------------------
             # LOGIC CORRECTION PER USER:
@@ -282,7 +307,7 @@ class DownloadQueryBot:
                         if frame.locator('#btnMoveAll').is_visible():
                             found_frame = frame
                             break
-                    except:
+                    except Exception:
                         pass
                 if found_frame:
                     break
@@ -290,6 +315,7 @@ class DownloadQueryBot:
             
             if not found_frame:                  
                 self.logger.error("Popup frame not found and no alert detected.")
+                capture_failure(self.page, 'download_popup')
                 return "ERROR"
             
             self.logger.info("Found selection popup frame (Valid for submission).")
@@ -322,35 +348,30 @@ class DownloadQueryBot:
             return "ERROR"
     
     def write_skipped_targets(self, skipped_targets):
-        with open("output/download/skipped_targets.txt", "a") as f:
-            for target in skipped_targets:
-                f.write(target['id'] + "\n")
+        append_lines(self.download_dir / 'skipped_targets.txt', [target['id'] for target in skipped_targets])
+        for target in skipped_targets:
+            record_event(self.download_dir.parent, 'download', 'skipped', target=target['id'])
 
     def write_failed_targets(self, failed_targets):
-        with open("output/download/failed_targets.txt", "a") as f:
-            for target in failed_targets:
-                f.write(target['id'] + "\n")
+        append_lines(self.download_dir / 'failed_targets.txt', [target['id'] for target in failed_targets])
+        for target in failed_targets:
+            record_event(self.download_dir.parent, 'download', 'failed', target=target['id'])
 
     def write_done_targets(self, done_targets):
-        with open("output/download/done_targets.txt", "a") as f:
-            for target in done_targets:
-                f.write(target['id'] + "\n")
-
-    def write_done_pages(self, done_pages):
-        with open("output/download/done_pages.txt", "a") as f:
-            for page in done_pages:
-                f.write(str(page) + "\n")
+        append_lines(self.download_dir / 'done_targets.txt', [target['id'] for target in done_targets])
+        for target in done_targets:
+            record_event(self.download_dir.parent, 'download', 'done', target=target['id'])
 
     def load_done_targets(self):
         try:
-            with open("output/download/done_targets.txt", "r") as f:
+            with open(self.download_dir / 'done_targets.txt', "r") as f:
                 return [int(line.strip()) for line in f]
         except FileNotFoundError:
             return []
 
     def load_done_pages(self):
         try:
-            with open("output/download/done_pages.txt", "r") as f:
+            with open(self.download_dir / 'done_pages.txt', "r") as f:
                 try:
                     return [int(line.strip()) for line in f][-1]
                 except IndexError:
@@ -360,18 +381,64 @@ class DownloadQueryBot:
     
     def load_skipped_targets(self):
         try:
-            with open("output/download/skipped_targets.txt", "r") as f:
+            with open(self.download_dir / 'skipped_targets.txt', "r") as f:
                 return [int(line.strip()) for line in f if line.strip()]
         except FileNotFoundError:
             return []
 
     def load_failed_targets(self):
         try:
-            with open("output/download/failed_targets.txt", "r") as f:
+            with open(self.download_dir / 'failed_targets.txt', "r") as f:
                 return [int(line.strip()) for line in f]
         except FileNotFoundError:
             return []
             
+    def load_scan_state(self):
+        """
+        Loads the id range already handled in the results grid. Ids rise
+        monotonically, so every id above `high` is new, every id in
+        [low, high] has been seen and ids below `low` are backlog. Seen ids
+        that failed or were deferred are kept in `retry` (id -> failed
+        attempts) until they are done, skipped or out of attempts. The first
+        load bootstraps the range from the existing target lists.
+        """
+        state_path = self.download_dir / self.leases.scoped('scan_state.json')
+        processed_ids = self._load_processed_ids()
+        failed_ids = {target_id: 1 for target_id in set(self.load_failed_targets()) - processed_ids}
+        if state_path.exists():
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+            # States written before the retry set existed dropped failed ids,
+            # and the first version kept a plain list.
+            retry = state.get('retry', failed_ids)
+            if isinstance(retry, list):
+                retry = {target_id: 1 for target_id in retry}
+            state['retry'] = {int(k): v for k, v in retry.items() if int(k) not in processed_ids}
+            return state
+
+        handled = self.load_done_targets() + self.load_skipped_targets() + self.load_failed_targets()
+        state = {'high': None, 'low': None, 'low_page': 1, 'complete': False, 'retry': failed_ids}
+        if handled:
+            state.update(high=max(handled), low=min(handled), low_page=max(1, self.load_done_pages() - 1))
+        self.write_scan_state(state)
+        return state
+
+    def write_scan_state(self, state):
+        state_path = self.download_dir / self.leases.scoped('scan_state.json')
+        tmp_path = state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({**state, 'retry': {str(k): v for k, v in sorted(state['retry'].items())}}, f)
+        os.replace(tmp_path, state_path)
+
+    def _retry_later(self, retry, target_id):
+        """Counts a failed attempt; a target out of attempts stays in failed_targets.txt only."""
+        attempts = retry.get(target_id, 0) + 1
+        if attempts > self.max_retries:
+            retry.pop(target_id, None)
+            self.logger.warning(f"Target {target_id} failed {attempts} times. No more retries.")
+        else:
+            retry[target_id] = attempts
+
     def _download_target(self, target):
         try:
             self.logger.info("Downloading target {}...".format(target))
@@ -382,11 +449,14 @@ class DownloadQueryBot:
             target_row = self.page.locator(f'{grid_selector} tr').filter(has_text=target['id']).first
 
             download_icon = target_row.locator('input[src*="Download"]')
-            download_icon.wait_for(state="visible", timeout=5000)
+            with measure('download_icon'):
+                download_icon.wait_for(state="visible", timeout=timeout_for('download_icon', 5000))
             ensure_popup_closed(self.page, self.logger)
             setup_auto_close_popup(self.page, self.logger)  
         
-            status = self._handle_download_popup(download_icon, target)
+            with self.timer.step('download_popup', target=target['id']) as outcome:
+                status = self._handle_download_popup(download_icon, target)
+                outcome['ok'] = status != "ERROR"
             return status
             
         except Exception as e:
@@ -394,72 +464,324 @@ class DownloadQueryBot:
             self.logger.error(str(e))
             return "ERROR"
 
+    def _load_processed_ids(self):
+        # Combine skipped into done to avoid retry
+        processed_ids = set(self.load_done_targets())
+        processed_ids.update(self.load_skipped_targets())
+        return processed_ids
+
+    def _process_page(self, current_page, processed_ids, accept=lambda target_id: True, retry=None):
+        """
+        Downloads every unprocessed target on the current page whose id passes
+        `accept`. Failed targets are counted in `retry` (when given), done
+        and skipped ones leave it. Returns how many were handled and the
+        ids the page showed.
+        """
+        with self.timer.step('get_download_targets', page=current_page):
+            all_targets = self._get_download_targets()
+        page_ids = [int(t['id']) for t in all_targets]
+        # Filter out processed ids
+        pick = lambda targets: [t for t in targets if int(t['id']) not in processed_ids and accept(int(t['id']))]
+        not_downloaded_targets = pick(all_targets)
+
+        handled = 0
+        while not_downloaded_targets:
+            target = not_downloaded_targets.pop(0)
+            lease_item = f"target:{target['id']}"
+            if not self.leases.claim(lease_item):
+                continue
+            if self.leases.enabled:
+                # Pick up targets other hosts finished since the page was read.
+                processed_ids.update(self._load_processed_ids())
+                if int(target['id']) in processed_ids:
+                    self.leases.release(lease_item)
+                    continue
+            if self.breaker.wait_until_closed():
+                self._restart_session(current_page)
+            self.logger.info("="*60)
+            target_start_time = time.time()
+            with log_context(target=target['id']), \
+                    self.tracer.capture(self.browser_manager.context, f"target-{target['id']}",
+                                        target=target['id']):
+                status = self.session.run(
+                    lambda: self.page, self._download_target, target,
+                    restore=lambda: self._navigate_to_results() and self._handle_pagination(current_page),
+                    ok=lambda status: status != "ERROR",
+                )
+            if self.breaker.record(status != "ERROR", time.time() - target_start_time, self.page) \
+                    and status == "ERROR" and self.breaker.defer(lease_item):
+                # The site is failing, not this target: the retry set brings it back on a later scan.
+                self.logger.warning("Deferred target {} (circuit breaker opened)".format(target))
+                if retry is not None:
+                    self._retry_later(retry, int(target['id']))
+                self.leases.release(lease_item)
+                continue
+            if retry is not None:
+                if status in ("DOWNLOADED", "SKIPPED"):
+                    retry.pop(int(target['id']), None)
+                else:
+                    self._retry_later(retry, int(target['id']))
+            if status == "DOWNLOADED":
+                self.write_done_targets([target])
+                self.leases.release(lease_item, 'done')
+                self.check_memory()
+                ensure_popup_closed(self.page, self.logger)
+                self._navigate_to_results()
+                self._handle_pagination(current_page)
+                processed_ids.add(int(target['id']))
+                handled += 1
+                self.logger.info("Downloaded target {}".format(target))
+                
+                targets = self._get_download_targets()
+                not_downloaded_targets = pick(targets)
+                ensure_popup_closed(self.page, self.logger)
+            
+            elif status == "SKIPPED":
+                self.logger.info("Skipped target {} (Data not available or alert)".format(target))
+                # Re-enabling navigation to ensure clean state after alert/popup issues
+                self.check_memory()
+                ensure_popup_closed(self.page, self.logger)
+                self._navigate_to_results()
+                self._handle_pagination(current_page)
+                
+                processed_ids.add(int(target['id'])) # Add to local set
+                handled += 1
+                self.write_skipped_targets([target])
+                self.leases.release(lease_item, 'skipped')
+            else:
+                self.logger.error("Failed to download target {}".format(target))
+                self.write_failed_targets([target])
+                self.leases.release(lease_item, 'failed')
+                continue
+        return handled, page_ids
+
+    def _navigate_to_results(self):
+        return self.session.run(lambda: self.page, lambda: navigate_to_results(self.page, self.logger))
+
+    def _restart_session(self, current_page):
+        self.logger.info("Restarting browser after circuit breaker pause...")
+        self.browser_manager.stop()
+        self.start_browser()
+        self.login()
+        self._navigate_to_results()
+        self._handle_pagination(current_page)
+
+    def _goto_page(self, page_no):
+        with self.timer.step('pagination', page=page_no) as outcome:
+            outcome['ok'] = self._handle_pagination(page_no)
+        if outcome['ok']:
+            self.logger.info("Navigated to page {}".format(page_no))
+            ensure_popup_closed(self.page, self.logger)
+        else:
+            self.logger.error("Failed to navigate to page {}".format(page_no))
+        return outcome['ok']
+
+    def _scan_new(self, processed_ids, state):
+        """
+        Handles the rows above the high-water mark, paging from the top of the
+        grid and stopping at the first page that reaches already-seen ids.
+        Retry ids on those pages are taken along. Returns how many targets
+        were handled.
+        """
+        high = state['high']
+        retry = state['retry']
+        handled_total = 0
+        newest = high
+        self.new_rows_seen = 0
+        page_no = 1
+        while True:
+            if not self._goto_page(page_no):
+                break
+            if high is None:
+                # Nothing handled yet: everything on the grid is backlog.
+                _, page_ids = self._process_page(page_no, processed_ids, accept=lambda target_id: False)
+                if page_ids:
+                    state.update(high=max(page_ids), low=max(page_ids) + 1, low_page=1)
+                break
+            handled, page_ids = self._process_page(page_no, processed_ids, retry=retry,
+                                                   accept=lambda target_id: target_id > high or target_id in retry)
+            handled_total += handled
+            self.new_rows_seen += sum(1 for target_id in page_ids if target_id > high)
+            if page_ids:
+                newest = max(newest, max(page_ids))
+            if not page_ids or min(page_ids) <= high:
+                break
+            page_no += 1
+
+        if newest is not None and newest != high:
+            self.logger.info(f"High-water mark advanced {high} -> {newest} ({handled_total} new targets).")
+            state['high'] = newest
+        self.write_scan_state(state)
+        return handled_total
+
+    def _scan_backlog(self, processed_ids, state, page_size):
+        """Continues below the low-water mark until the end of the grid is reached."""
+        page_no = state.get('low_page', 1)
+        while True:
+            if not self._goto_page(page_no):
+                break
+            low, retry = state['low'], state['retry']
+            _, page_ids = self._process_page(page_no, processed_ids, retry=retry,
+                                             accept=lambda target_id: target_id < low or target_id in retry)
+            if not page_ids:
+                state['complete'] = True
+                break
+            state.update(low=min(low, min(page_ids)), low_page=page_no)
+            self.write_scan_state(state)
+            if len(page_ids) < page_size:
+                # A partial page is the last one.
+                state['complete'] = True
+                break
+            page_no += 1
+
+        if state['complete']:
+            self.logger.info("Backlog scan complete: reached the end of the results grid.")
+        self.write_scan_state(state)
+
+    def _scan_retries(self, processed_ids, state, page_size):
+        """
+        Revisits the failed and deferred targets inside the seen range,
+        paging from the top of the grid until it passes the oldest of them.
+        Every failure uses up one of `max_retries` attempts and ids the pass
+        no longer finds on the grid are dropped, so a deep walk is repeated
+        only while an old target still has attempts left.
+        """
+        retry = state['retry']
+        if not retry:
+            return
+        oldest = min(retry)
+        self.logger.info(f"Retrying {len(retry)} failed targets (oldest {oldest}).")
+        seen = set()
+        reached_end = False
+        page_no = 1
+        while retry and self._goto_page(page_no):
+            _, page_ids = self._process_page(page_no, processed_ids, retry=retry,
+                                             accept=lambda target_id: target_id in retry)
+            seen.update(page_ids)
+            self.write_scan_state(state)
+            if not page_ids or min(page_ids) <= oldest or len(page_ids) < page_size:
+                reached_end = True
+                break
+            page_no += 1
+
+        if reached_end:
+            gone = [target_id for target_id in retry if target_id not in seen]
+            for target_id in gone:
+                retry.pop(target_id)
+            if gone:
+                self.logger.info(f"Dropped {len(gone)} retry targets no longer on the results grid.")
+        self.write_scan_state(state)
+
     def execute(self):
         self.start_browser()
         if self.login():
             self.logger.info("\n" + "="*60)
             self.logger.info("   WITS AUTOMATION: STARTING EXECUTION")
             self.logger.info("="*60 + "\n")
-            if navigate_to_results(self.page, self.logger):
-                self.current_page = self.load_done_pages()
-                current_page = self.current_page
-                done_ids = self.load_done_targets()
-                skipped_ids = self.load_skipped_targets()
-                failed_ids = self.load_failed_targets()
-                
-                # Combine skipped into done to avoid retry
-                processed_ids = set(done_ids)
-                processed_ids.update(skipped_ids)
+            with self.timer.step('navigate_to_results') as outcome:
+                outcome['ok'] = self._navigate_to_results()
+            if outcome['ok']:
+                processed_ids = self._load_processed_ids()
+                state = self.load_scan_state()
+                self.logger.info(f"Scan state: high={state['high']} low={state['low']} complete={state['complete']}")
 
-                while True:
-                    if self._handle_pagination(current_page):
-                        self.logger.info("Navigated to page {}".format(current_page))
-                    else:
-                        self.logger.error("Failed to navigate to page {}".format(current_page))
-                        # If failed to navigate and it's > 1, prevent infinite loop if stuck
-                        break
-                            
-                    ensure_popup_closed(self.page, self.logger)
-                    
-                    all_targets = self._get_download_targets()
-                    # Filter out processed ids
-                    not_downloaded_targets = [t for t in all_targets if int(t['id']) not in processed_ids]
-
-                    while not_downloaded_targets:
-                        target = not_downloaded_targets.pop(0)
-                        self.logger.info("="*60)
-                        status = self._download_target(target)
-                        if status == "DOWNLOADED":
-                            self.write_done_targets([target])
-                            ensure_popup_closed(self.page, self.logger)
-                            navigate_to_results(self.page, self.logger)
-                            self._handle_pagination(current_page)
-                            processed_ids.add(int(target['id']))
-                            self.logger.info("Downloaded target {}".format(target))
-                            
-                            targets = self._get_download_targets()
-                            not_downloaded_targets = [t for t in targets if int(t['id']) not in processed_ids]
-                            ensure_popup_closed(self.page, self.logger)
-                        
-                        elif status == "SKIPPED":
-                            self.logger.info("Skipped target {} (Data not available or alert)".format(target))
-                            # Re-enabling navigation to ensure clean state after alert/popup issues
-                            ensure_popup_closed(self.page, self.logger)
-                            navigate_to_results(self.page, self.logger)
-                            self._handle_pagination(current_page)
-                            
-                            processed_ids.add(int(target['id'])) # Add to local set
-                            self.write_skipped_targets([target])
-                        else:
-                            self.logger.error("Failed to download target {}".format(target))
-                            self.write_failed_targets([target])
-                            continue
-                            
-                    self.current_page += 1
-                    current_page = self.current_page # Fix: Update local variable to prevent infinite loop
-                    self.write_done_pages([current_page])
+                page_size = len(self._get_download_targets()) or 1
+                self._scan_new(processed_ids, state)
+                if state['retry'] and self._navigate_to_results():
+                    self._scan_retries(processed_ids, state, page_size)
+
+                if state['high'] is not None and not state['complete']:
+                    # New rows push the backlog down by whole pages.
+                    state['low_page'] = state.get('low_page', 1) + self.new_rows_seen // page_size
+                    self._navigate_to_results()
+                    self._scan_backlog(processed_ids, state, page_size)
             else:
                 self.logger.error("Failed to navigate to results page.")
         else:
             self.logger.error("Login failed.")
-            
\ No newline at end of file
+
+    def download_jobs(self, manifest):
+        """
+        Runs the download-stage jobs of a JSONL manifest. Ids fall down the
+        grid as they age, so each job pages from the top only until it passes
+        its lowest pending id.
+        """
+        self.start_browser()
+        if not self.login():
+            self.logger.error("Login failed.")
+            return
+        processed_ids = self._load_processed_ids()
+
+        for job in manifest.jobs():
+            job_id = job['job_id']
+            wanted = {int(t) for t in job['targets']}
+            self.logger.info(f"   [JOB] {job_id}: {len(wanted)} targets (priority {job.get('priority', 0)})")
+            manifest.set_status(job_id, 'running')
+
+            pending = wanted - processed_ids
+            page_no = 1
+            with log_context(job=job_id):
+                if pending and self._navigate_to_results():
+                    while pending and self._goto_page(page_no):
+                        _, page_ids = self._process_page(page_no, processed_ids, accept=lambda target_id: target_id in pending)
+                        lowest_pending = min(pending)
+                        pending -= processed_ids
+                        if not page_ids or min(page_ids) < lowest_pending:
+                            break
+                        page_no += 1
+
+            done = wanted & processed_ids
+            status = 'done' if done == wanted else ('partial' if done else 'failed')
+            manifest.set_status(job_id, status, done=len(done), remaining=sorted(wanted - done))
+            self.logger.info(f"   [JOB] {job_id}: {status} ({len(done)}/{len(wanted)} targets handled)")
+
+    def watch(self, submissions):
+        """
+        Pipeline mode: waits on the execute stage's submission queue and, after
+        each batch of submissions, rescans the first results page so every
+        extract is triggered soon after WITS finishes it. Returns once the
+        execute stage has finished and its submissions are accounted for, or
+        the drain timeout runs out.
+        """
+        settings = self.config.get('pipeline') or {}
+        poll_interval = settings.get('poll_interval', 60)
+        drain_timeout = settings.get('drain_timeout', 30 * 60)
+
+        self.start_browser()
+        if not self.login():
+            self.logger.error("Login failed.")
+            return
+        self.logger.info("\n" + "="*60)
+        self.logger.info("   WITS AUTOMATION: WATCHING SUBMISSIONS")
+        self.logger.info("="*60 + "\n")
+
+        processed_ids = self._load_processed_ids()
+        state = self.load_scan_state()
+        pending = 0
+        finished_at = None
+        while finished_at is None or pending > 0:
+            try:
+                item = submissions.get(timeout=poll_interval)
+                while True:
+                    if item is None:
+                        finished_at = time.time()
+                        self.logger.info("Execute stage finished. Draining remaining submissions...")
+                    else:
+                        pending += 1
+                        self.logger.info(f"Submission received: {item['query']} / {item['country']} (pending: {pending})")
+                    item = submissions.get_nowait()
+            except queue.Empty:
+                pass
+
+            if pending:
+                if self._navigate_to_results():
+                    pending = max(0, pending - self._scan_new(processed_ids, state))
+
+            if finished_at is not None and time.time() - finished_at > drain_timeout:
+                self.logger.warning(f"Drain timeout reached with {pending} submissions still pending.")
+                break
+
+        # Rows that were still running when first seen failed; give them another pass.
+        if state['retry'] and self._navigate_to_results():
+            self._scan_retries(processed_ids, state, len(self._get_download_targets()) or 1)
+        self.logger.info("   WITS AUTOMATION: PIPELINE DOWNLOAD STAGE COMPLETED")
@@ -1,66 +1,136 @@
 import os
+import re
 from pathlib import Path
 import random
 from src.utils.browser import BrowserManager
 from src.utils.config import load_config
-from src.utils.logger import setup_logger
+from src.utils.logger import setup_logger, log_context
 from src.utils.login import Login
+from src.utils.timing import timer_from_config
+from src.utils.tracing import TraceSampler
+from src.utils.progress import record_event
+from src.utils.memory import MemoryMonitor
+from src.utils.batching import group_year_runs, plan_query_batches
+from src.utils.journal import SubmissionJournal
+from src.utils.filelock import append_lines
+from src.utils.circuit import CircuitBreaker
+from src.utils.session import SessionGuard
+from src.utils.capture import configure_capture, capture_failure, clear_failure_note
+from src.utils.timeouts import configure_timeouts
+from src.utils.leases import LeaseManager
+from src.utils.scheduler import CountryScheduler
 
 from src.wits.navigation import select_existing_query
 from src.wits.navigation import navigate_to_advanced_query
+from src.wits.navigation import list_existing_queries
+from src.wits.navigation import navigate_to_results, read_results_grid
 from src.wits.reporter import modify_reporter
 from src.wits.reporter import click_final_submit    
+from src.wits.catalogue import CountryCatalogue
 
 class ExecuteQueryBot:
-    def __init__(self, config):
+    def __init__(self, config, submissions=None):
         self.config = config
-        self.logger = setup_logger(name='execute_query')
+        # Pipeline mode: each successful submission is also put on this queue
+        # for the download stage; None is sent once the sweep is over.
+        self.submissions = submissions
+        self.logger = setup_logger(name='execute_query', config=config)
         self.browser_manager = None
         self.page = None
+        self.timer = timer_from_config(config)
+        self.tracer = TraceSampler(config, self.logger)
+        self.memory = MemoryMonitor(config, self.logger)
+        self.breaker = CircuitBreaker(config, self.logger)
+        self.session = SessionGuard(config, self.logger, login=self.login)
+        configure_timeouts(config)
+        configure_capture(config, self.logger)
+        self.leases = LeaseManager(config, self.logger)
+        self.scheduler = CountryScheduler(config, self.logger)
+        self.catalogue = CountryCatalogue(config, self.logger)
+        # Newest results-grid id seen at startup, and the (query, country)
+        # pairs whose submission could not be confirmed either way.
+        self.grid_top = None
+        self.unconfirmed = set()
         self.setup_dirs()
         
     def setup_dirs(self):
         self.logger.info("Setting up directories...")
         cur_dir = os.getcwd()
-        output_dir = Path(cur_dir) / 'output' / 'queries'
+        output_dir = Path(cur_dir) / self.config.get('output_dir', 'output') / 'queries'
         output_dir.mkdir(parents=True, exist_ok=True)
         self.output_dir = output_dir
         self.done_dir = output_dir / 'done'
         self.done_dir.mkdir(parents=True, exist_ok=True)
         self.failed_dir = output_dir / 'failed'
         self.failed_dir.mkdir(parents=True, exist_ok=True)
+        self.journal = SubmissionJournal(output_dir / self.leases.scoped('journal.jsonl'))
+        self.intent_id = None
 
     def start_browser(self):
         self.logger.info("Starting browser...")
-        self.browser_manager = BrowserManager(self.config)
+        self.browser_manager = BrowserManager(self.config, name='execute')
         self.page = self.browser_manager.start()
+        self.session.attach(self.page)
     
+    def check_memory(self):
+        """Recycles the page or context once the memory monitor reports growth."""
+        action = self.memory.check(self.page)
+        if action is None:
+            return
+        self.logger.warning(f"   [MEMORY] Threshold exceeded. Recycling browser {action}...")
+        if action == 'context':
+            self.page = self.browser_manager.recycle_context()
+        else:
+            self.page = self.browser_manager.recycle_page()
+        self.session.attach(self.page)
+
     def login(self):
         self.logger.info("Performing login...")
-        login_manager = Login(self.page, self.config)
-        if login_manager.perform_login():
+        login_manager = Login(self.page, self.config, self.logger)
+        with self.timer.step('login') as outcome:
+            outcome['ok'] = login_manager.perform_login()
+        if outcome['ok']:
+            self.session.mark_logged_in()
             self.logger.info("Login successful.")
             return True
     
 
     def execute(self):
+        try:
+            self._execute()
+        finally:
+            if self.submissions is not None:
+                self.submissions.put(None)
+
+    def _execute(self):
         self.start_browser()
         if self.login():
             self.logger.info("\n" + "="*60)
             self.logger.info("   WITS AUTOMATION: STARTING EXECUTION")
             self.logger.info("="*60 + "\n")
+            self.reconcile_submissions()
             
             query_names = self.config['query_name']
             if isinstance(query_names, str):
                 query_names = [query_names]
-            random.shuffle(query_names)
-            for query_name in query_names:
+            self.catalogue.ensure(self.page, query_names[0])
+            plan = self.plan_queries(query_names)
+            if self.config['workflow'].get('shuffle_queries', True):
+                random.shuffle(plan)
+            for query_name, members in plan:
                 self.logger.info("\n" + "-"*50)
                 self.logger.info(f"   [QUERY] Processing Query: {query_name}")
                 self.logger.info("-"*50)
                 
                 try:
-                    self.execute_single_query(query_name)
+                    leftovers = self.per_year_leftovers(members) if len(members) > 1 else set()
+                    self.execute_single_query(query_name, members)
+                    if leftovers:
+                        # Countries done for only some years, and reporters kept
+                        # out of batches, still go through the per-year queries.
+                        # Countries that failed in the batch wait for the next run.
+                        for member in members:
+                            self.execute_single_query(member, countries=leftovers)
                     self.logger.info(f"   [SUCCESS] Query {query_name} completed.")
                 except Exception as e:
                     self.logger.error(f"   [ERROR] Query {query_name} crashed: {e}")
@@ -77,15 +147,137 @@ class ExecuteQueryBot:
             self.logger.info("Browser closed.")
             
 
-    def execute_single_query(self, query_name):
+    def reconcile_submissions(self):
+        """
+        Resolves intents left open by a crash between the final submit and the
+        done bookkeeping. A results row naming the query and the country, newer
+        than the grid's top row when the intent was written, proves the
+        submission went through, so the country is recorded as done;
+        otherwise the intent is aborted and the country is submitted again.
+        When the grid cannot be read or shows no rows the intents stay open
+        and their countries are held back for this run.
+        """
+        pending = self.journal.pending()
+        rows = read_results_grid(self.page, self.logger) if self.session.run(
+            lambda: self.page, lambda: navigate_to_results(self.page, self.logger)) else None
+        if rows:
+            self.grid_top = max(int(r['id']) for r in rows)
+        if not pending:
+            # Drops the resolved intent/commit pairs of the previous runs.
+            self.journal.compact()
+            return
+        self.logger.info(f"   -> Reconciling {len(pending)} unconfirmed submission(s) against the results grid...")
+        if not rows:
+            self.unconfirmed = {(member, intent['country']) for intent in pending for member in intent['members']}
+            self.logger.warning(f"   -> Results grid unavailable. Leaving {len(pending)} submission(s) unconfirmed and their countries held back.")
+            self.journal.compact()
+            return
+
+        for intent in pending:
+            query_name, country_code, after = intent['query'], intent['country'], intent.get('after')
+            lease_item = f"{query_name}:{country_code}"
+            if not self.leases.claim(lease_item):
+                # Another worker on this host is submitting it right now, or
+                # a killed predecessor's lease has not expired yet: either way
+                # the intent stays open and the country is held back.
+                self.unconfirmed.update((member, country_code) for member in intent['members'])
+                continue
+            matched = [
+                r for r in rows
+                if r['name'] == query_name and (after is None or int(r['id']) > after)
+                and re.search(rf'\b{country_code}\b', r['text'])
+            ]
+            if matched:
+                for member in intent['members']:
+                    self.write_done_country(member, country_code)
+                self.journal.commit(intent['id'])
+                self.logger.info(f"   [RECONCILED] {query_name} / {country_code} found as query {matched[0]['id']}. Marked done.")
+                self.leases.release(lease_item, 'done')
+            else:
+                self.journal.abort(intent['id'])
+                self.logger.info(f"   [RECONCILED] {query_name} / {country_code} not in results. Will resubmit.")
+                self.leases.release(lease_item)
+        self.journal.compact()
+
+    def plan_queries(self, query_names):
+        """
+        Pairs each saved query to submit with the per-year queries it covers.
+        With query batching on, runs of consecutive years are submitted through
+        one multi-year saved query (e.g. Auto2007-2009) when WITS has it.
+        """
+        batching = self.config.get('query_batching') or {}
+        if not batching.get('enabled', False):
+            return [(query_name, [query_name]) for query_name in query_names]
+
+        max_years = int(batching.get('max_years', 3))
+        available = []
+        if navigate_to_advanced_query(self.page, self.logger):
+            available = list_existing_queries(self.page, self.logger)
+        for batch_name, members in group_year_runs(query_names, max_years):
+            if len(members) > 1 and batch_name not in available:
+                self.logger.warning(f"   [BATCH] Saved query '{batch_name}' not found on WITS. Running {', '.join(members)} per year.")
+        return plan_query_batches(query_names, max_years, available)
+
+    def execute_jobs(self, manifest):
+        """Runs the execute-stage jobs of a JSONL manifest instead of the config work lists."""
+        self.start_browser()
+        if not self.login():
+            self.logger.error("   [FATAL] Login failed. Aborting.")
+            self.browser_manager.stop()
+            return
+        self.reconcile_submissions()
+
+        known = set(self.config['iso3_to_country'].keys())
+        for job in manifest.jobs():
+            if self.catalogue.countries is None:
+                self.catalogue.ensure(self.page, job['query'])
+            job_id, query_name = job['job_id'], job['query']
+            countries = set(job.get('countries') or known)
+            unknown = countries - known
+            self.logger.info("\n" + "-"*50)
+            self.logger.info(f"   [JOB] {job_id}: {query_name} for {len(countries)} countries (priority {job.get('priority', 0)})")
+            self.logger.info("-"*50)
+            manifest.set_status(job_id, 'running')
+            try:
+                with log_context(job=job_id):
+                    self.execute_single_query(query_name, countries=countries & known)
+            except Exception as e:
+                self.logger.error(f"   [ERROR] Job {job_id} crashed: {e}")
+
+            done = countries & self.load_done_countries(query_name)
+            status = 'done' if done == countries else ('partial' if done else 'failed')
+            manifest.set_status(job_id, status, done=len(done), remaining=sorted(countries - done), unknown=sorted(unknown))
+            self.logger.info(f"   [JOB] {job_id}: {status} ({len(done)}/{len(countries)} countries done)")
+
+    def execute_single_query(self, query_name, members=None, countries=None):
+        """
+        Submits `query_name` for every country still missing, or only for
+        `countries` when given. `members` are the per-year queries a
+        multi-year saved query covers: a country is only batched when none
+        of its years is done yet, and the done/failed bookkeeping is written
+        back for each year.
+        """
         import time
         query_start_time = time.time()
+        members = members or [query_name]
         
         self.logger.info(f"   -> Loading Progress status...")
-        done_countries = self.load_done_countries(query_name)
-        all_countries = set(self.config['iso3_to_country'].keys())
+        done_countries = set().union(*(self.load_done_countries(member) for member in members))
+        all_countries = set(countries) if countries is not None else set(self.config['iso3_to_country'].keys())
         countries_to_process = all_countries - done_countries
-        countries_to_process = sorted(countries_to_process)
+        if len(members) > 1:
+            per_year = set((self.config.get('query_batching') or {}).get('per_year_countries') or [])
+            countries_to_process -= per_year
+        held = {country for member, country in self.unconfirmed if member in members} & countries_to_process
+        if held:
+            self.logger.warning(f"   -> Holding back {len(held)} countries with unconfirmed submissions: {', '.join(sorted(held))}")
+            countries_to_process -= held
+        countries_to_process, unknown = self.catalogue.known(countries_to_process)
+        if unknown:
+            self.logger.warning(f"   -> Skipping {len(unknown)} codes not in the WITS country list: {', '.join(sorted(unknown))}")
+        batches = self.scheduler.plan(countries_to_process)
+        countries_to_process = [country for batch in batches for country in batch]
+        batch_ends = {batch[-1] for batch in batches}
         #random.shuffle(countries_to_process)
         failed_countries = set()
         
@@ -99,33 +291,79 @@ class ExecuteQueryBot:
         stats_success_count = 0
         failed = False
         for country_code in countries_to_process:
+            if self.breaker.wait_until_closed():
+                self.logger.info("Restarting browser after circuit breaker pause...")
+                self.browser_manager.stop()
+                self.start_browser()
+                self.login()
+            lease_item = f"{query_name}:{country_code}"
+            if not self.leases.claim(lease_item):
+                continue
+            if self.leases.enabled and any(country_code in self.load_done_countries(m) for m in members):
+                # Another host finished it after this sweep started.
+                self.leases.release(lease_item)
+                continue
             country_start_time = time.time()
             self.logger.info(f"\n   [{current_idx}/{total}] Processing Country: {country_code}")
             
-            result = self.process_country(query_name, country_code)
+            with log_context(query=query_name, country=country_code), \
+                    self.tracer.capture(self.browser_manager.context, f"{query_name}-{country_code}",
+                                        query=query_name, country=country_code):
+                result = self.process_country(query_name, country_code, members)
             
             country_duration = time.time() - country_start_time
-            
+
+            # A submit that raised may still have gone through: the country
+            # waits for the next reconcile instead of being submitted again.
+            submit_unknown = not result and self.intent_id is not None
+            if submit_unknown:
+                self.unconfirmed.update((member, country_code) for member in members)
+                self.intent_id = None
+                self.logger.warning(f"      [RESULT] Submission of {country_code} unconfirmed. Held back until reconciled.")
+
+            if self.breaker.record(result, country_duration, self.page) and not result \
+                    and not submit_unknown and self.breaker.defer(lease_item):
+                # The site is failing, not this country: retry it once WITS is back.
+                self.logger.warning(f"      [RESULT] Deferred: {country_code} (circuit breaker opened)")
+                self.leases.release(lease_item)
+                countries_to_process.append(country_code)
+                continue
+
             if not result:
-                self.write_failed_country(query_name, country_code)
+                for member in members:
+                    self.write_failed_country(member, country_code, duration=country_duration)
+                self.leases.release(lease_item, 'failed')
                 self.logger.warning(f"      [RESULT] Failed: {country_code} [TIME: {country_duration:.2f}s]")
                 failed = True
-                self.logger.info("Browser closed.")
-                self.browser_manager.stop()
-                self.start_browser()
-                self.login()
+                # With the breaker open, the pause restarts the browser anyway.
+                if not self.breaker.is_open():
+                    self.logger.info("Browser closed.")
+                    self.browser_manager.stop()
+                    self.start_browser()
+                    self.login()
             else:
                 stats_total_duration += country_duration
                 stats_success_count += 1
                 avg_duration = stats_total_duration / stats_success_count
                 
-                self.write_done_country(query_name, country_code)
+                for member in members:
+                    self.write_done_country(member, country_code, duration=country_duration)
+                self.journal.commit(self.intent_id)
+                self.intent_id = None
+                self.leases.release(lease_item, 'done')
+                if self.submissions is not None:
+                    self.submissions.put({'query': query_name, 'country': country_code})
                 self.logger.info(f"      [RESULT] Success: {country_code} [TIME: {country_duration:.2f}s | AVG: {avg_duration:.2f}s]")
+                self.check_memory()
                 if failed:
                     success_count = 0
                     failed = False
                 success_count += 1
-                if success_count % 3 == 0:
+                if self.scheduler.enabled:
+                    long_pause = country_code in batch_ends
+                else:
+                    long_pause = success_count % 3 == 0
+                if long_pause:
                     self.logger.info(f"      [SUCCESS] {success_count} out of {total} countries processed successfully.") 
                     self.logger.info("      -> Waiting for 70 Seconds...")
                     self.page.wait_for_timeout(70*1000)
@@ -138,31 +376,55 @@ class ExecuteQueryBot:
 
         
     
-    def process_country(self, query_name, country_code):
+    def process_country(self, query_name, country_code, members=None):
         # self.logger.info(f"Processing country {country_code} for query {query_name}...") 
         # (Redundant log removed in favor of loop log)
         try:
-            navigation_advanced_query = navigate_to_advanced_query(self.page, self.logger)
+            tags = {'query': query_name, 'country': country_code}
+            # Steps before the submit are replayed after a mid-run re-login.
+            to_advanced_query = lambda: navigate_to_advanced_query(self.page, self.logger)
+            with self.timer.step('navigate_to_advanced_query', **tags) as outcome:
+                navigation_advanced_query = outcome['ok'] = self.session.run(lambda: self.page, to_advanced_query)
             if not navigation_advanced_query:
                 self.logger.error("      [ERROR] Nav to Advanced Query failed.")
                 return False
             
-            query_selection = select_existing_query(self.page, query_name, self.logger)
+            with self.timer.step('select_existing_query', **tags) as outcome:
+                query_selection = outcome['ok'] = self.session.run(
+                    lambda: self.page, select_existing_query, self.page, query_name, self.logger,
+                    restore=to_advanced_query,
+                )
             if not query_selection:
                 self.logger.error(f"      [ERROR] Selecting query '{query_name}' failed.")
                 return False
             
-            reporter_modification = modify_reporter(
-                page=self.page,logger=self.logger, 
-                country_code=country_code, query_name=query_name, 
-                country_name=self.config['iso3_to_country'][country_code]
-            )
+            with self.timer.step('modify_reporter', **tags) as outcome:
+                reporter_modification = outcome['ok'] = self.session.run(
+                    lambda: self.page, modify_reporter,
+                    page=self.page,logger=self.logger, 
+                    country_code=country_code, query_name=query_name, 
+                    country_name=self.config['iso3_to_country'][country_code],
+                    item_id=self.catalogue.item_id(country_code),
+                    restore=lambda: to_advanced_query() and select_existing_query(self.page, query_name, self.logger),
+                )
             if not reporter_modification:
                 self.logger.error("      [ERROR] Modify Reporter failed.")
                 return False
             
-            submit  = click_final_submit(self.page, self.logger)
+            # If the submit raises, the intent stays open for reconciliation.
+            # It is never replayed, so it is captured here rather than by the session guard.
+            self.intent_id = self.journal.intent(query_name, country_code, members, after=self.grid_top)
+            clear_failure_note()
+            with self.timer.step('click_final_submit', **tags) as outcome:
+                try:
+                    submit = outcome['ok'] = click_final_submit(self.page, self.logger)
+                except Exception as e:
+                    capture_failure(self.page, 'click_final_submit', e)
+                    raise
             if not submit:
+                capture_failure(self.page, 'click_final_submit', 'Submit button not visible')
+                self.journal.abort(self.intent_id)
+                self.intent_id = None
                 self.logger.error("      [ERROR] Final Submit failed.")
                 return False
             
@@ -172,19 +434,26 @@ class ExecuteQueryBot:
             self.logger.error(f"      [EXCEPTION] {e}")
             return False
     
-    def write_done_country(self, query_name, country_code):
+    def write_done_country(self, query_name, country_code, duration=None):
         filename = f"{query_name}.txt"
         filepath = self.done_dir / filename
-        with open(filepath, 'a') as f:
-            f.write(f"{country_code}\n")
+        append_lines(filepath, [country_code])
+        record_event(self.output_dir.parent, 'execute', 'done', query=query_name, country=country_code, duration=duration)
         self.logger.info(f"Marked country {country_code} as done for query {query_name}.")
-    def write_failed_country(self, query_name, country_code):
+    def write_failed_country(self, query_name, country_code, duration=None):
         filename = f"{query_name}.txt"
         filepath = self.failed_dir / filename
-        with open(filepath, 'a') as f:
-            f.write(f"{country_code}\n")
+        append_lines(filepath, [country_code])
+        record_event(self.output_dir.parent, 'execute', 'failed', query=query_name, country=country_code, duration=duration)
         self.logger.info(f"Marked country {country_code} as failed for query {query_name}.")  
         
+    def per_year_leftovers(self, members):
+        """Countries a multi-year query leaves out: per-year reporters and those done for only some years."""
+        done = [self.load_done_countries(member) for member in members]
+        partial = set().union(*done) - set.intersection(*done)
+        per_year = set((self.config.get('query_batching') or {}).get('per_year_countries') or [])
+        return partial | (per_year - set.intersection(*done))
+
     def load_done_countries(self, query_name):
         filename = f"{query_name}.txt"
         filepath = self.done_dir / filename
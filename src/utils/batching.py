@@ -0,0 +1,56 @@
+import re
+
+YEAR_QUERY = re.compile(r'^(?P<prefix>.*?)(?P<year>\d{4})$')
+
+
+def range_query_name(prefix, first_year, last_year):
+    """Name of the saved query covering a year range, e.g. Auto2007-2009."""
+    return f"{prefix}{first_year}-{last_year}"
+
+
+def group_year_runs(query_names, max_years):
+    """
+    Groups per-year query names (Auto2007, Auto2008, ...) into runs of
+    consecutive years of at most `max_years`. Returns a list of
+    (range_query_name, member_query_names); names without a trailing
+    year form a run of their own.
+    """
+    by_prefix = {}
+    runs = []
+    for name in query_names:
+        match = YEAR_QUERY.match(name)
+        if match:
+            by_prefix.setdefault(match['prefix'], []).append((int(match['year']), name))
+        else:
+            runs.append((name, [name]))
+
+    for prefix, years in by_prefix.items():
+        years.sort()
+        groups = []
+        for year, name in years:
+            if groups and year == groups[-1][-1][0] + 1 and len(groups[-1]) < max_years:
+                groups[-1].append((year, name))
+            else:
+                groups.append([(year, name)])
+        for group in groups:
+            if len(group) == 1:
+                runs.append((group[0][1], [group[0][1]]))
+            else:
+                runs.append((range_query_name(prefix, group[0][0], group[-1][0]), [name for _, name in group]))
+    return runs
+
+
+def plan_query_batches(query_names, max_years, available_queries):
+    """
+    Returns (saved_query_name, member_query_names) pairs to execute. A run
+    is only batched when its range query is saved on WITS; otherwise each
+    of its years is executed on its own.
+    """
+    available = set(available_queries)
+    plan = []
+    for batch_name, members in group_year_runs(query_names, max_years):
+        if len(members) == 1 or batch_name in available:
+            plan.append((batch_name, members))
+        else:
+            plan.extend((name, [name]) for name in members)
+    return plan
@@ -1,22 +1,94 @@
+from pathlib import Path
 from playwright.sync_api import sync_playwright
 
+from src.utils.capture import attach_capture
+
+# Contexts opened so far in this process, per stage name. The bots build a
+# new BrowserManager on every restart, so the count lives here.
+_context_sequence = {}
+
+
 class BrowserManager:
-    def __init__(self, config):
+    def __init__(self, config, name='wits'):
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
-        self.headless = config.get('browser_settings', {}).get('headless', True)
+        self.name = name
+        settings = config.get('browser_settings', {})
+        self.headless = settings.get('headless', True)
+
+        # HAR record/replay: 'record' saves the requests of every context
+        # (restarts and recycles open new ones) to <dir>/<name>-NNN.har,
+        # 'replay' serves them back in the same order with no network access.
+        har = settings.get('har') or {}
+        self.har_mode = har.get('mode')
+        self.har_dir = Path(har.get('dir', 'output/har'))
 
     def start(self):
         self.playwright = sync_playwright().start()
         self.browser = self.playwright.chromium.launch(headless=self.headless)
-        self.context = self.browser.new_context()
+        self.context = self.new_context()
+        self.page = self.context.new_page()
+        attach_capture(self.page)
+        return self.page
+
+    def har_archives(self):
+        return sorted(self.har_dir.glob(f"{self.name}-*.har"))
+
+    def new_context(self, **kwargs):
+        sequence = _context_sequence.get(self.name, 0)
+        _context_sequence[self.name] = sequence + 1
+
+        if self.har_mode == 'record':
+            self.har_dir.mkdir(parents=True, exist_ok=True)
+            har_path = self.har_dir / f"{self.name}-{sequence:03d}.har"
+            return self.browser.new_context(record_har_path=str(har_path), **kwargs)
+
+        context = self.browser.new_context(**kwargs)
+        if self.har_mode == 'replay':
+            archives = self.har_archives()
+            if not archives:
+                raise FileNotFoundError(f"No HAR archives for '{self.name}' in {self.har_dir}")
+            # The archive recorded for this context answers first, the others
+            # back it up (routes match newest first), and whatever none of
+            # them holds is aborted so a replay never reaches WITS.
+            current = archives[min(sequence, len(archives) - 1)]
+            ordered = [a for a in archives if a != current] + [current]
+            for i, archive in enumerate(ordered):
+                context.route_from_har(str(archive), not_found='abort' if i == 0 else 'fallback')
+        return context
+
+    def recycle_page(self):
+        """Replaces the page with a fresh one in the same context (session cookies survive)."""
+        url = self.page.url
+        self.page.close()
+        self.page = self.context.new_page()
+        attach_capture(self.page)
+        if url.startswith('http'):
+            self.page.goto(url)
+        return self.page
+
+    def recycle_context(self):
+        """Replaces the whole context, carrying the login session over via its storage state."""
+        url = self.page.url
+        storage_state = self.context.storage_state()
+        self.context.close()
+        self.context = self.new_context(storage_state=storage_state)
         self.page = self.context.new_page()
+        attach_capture(self.page)
+        if url.startswith('http'):
+            self.page.goto(url)
         return self.page
 
     def stop(self):
+        # Closing the context first flushes a recorded HAR to disk.
+        if self.context:
+            try:
+                self.context.close()
+            except Exception:
+                pass
         if self.browser:
             self.browser.close()
         if self.playwright:
-            self.playwright.stop()
\ No newline at end of file
+            self.playwright.stop()
@@ -0,0 +1,185 @@
+import atexit
+import collections
+import hashlib
+import json
+import queue
+import threading
+import time
+import weakref
+from pathlib import Path
+
+from src.utils.logger import current_context
+from src.utils.ringdir import enforce_size_cap
+
+
+class FailureCapture:
+    """
+    Records what the browser looked like when a step failed: the DOM, a
+    viewport screenshot, and the recent network and console entries kept
+    in bounded per-page buffers. Only the page reads happen on the caller's
+    thread (Playwright's sync API is bound to it), and each is bounded by a
+    short timeout; hashing and disk writes go through a bounded queue to a
+    background writer. While that queue is full, captures are dropped
+    before the page is read at all. Files are named by
+    their sha256, so a repeated error page is stored once, and the
+    directory is size-capped. index.jsonl links every capture to its
+    query/country or target id.
+    """
+    def __init__(self, settings, root='output', logger=None):
+        self.logger = logger
+        self.enabled = settings.get('enabled', False)
+        self.screenshot = settings.get('screenshot', True)
+        self.max_bytes = int(settings.get('max_mb', 200)) * 1024 * 1024
+        self.dir = Path(settings.get('dir') or Path(root) / 'failures')
+        self.index_path = self.dir / 'index.jsonl'
+        self.timeout = int(settings.get('timeout_ms', 1500))
+        self.network_entries = int(settings.get('network_entries', 50))
+        self.console_entries = int(settings.get('console_entries', 50))
+        self.dropped = 0
+        self._buffers = weakref.WeakKeyDictionary()
+        self._queue = queue.Queue(maxsize=int(settings.get('queue_size', 16)))
+        self._writer = None
+        self.note = None
+
+    def attach(self, page):
+        """Keeps the last network responses/failures and console messages of a page."""
+        if not self.enabled or page in self._buffers:
+            return
+        network = collections.deque(maxlen=self.network_entries)
+        console = collections.deque(maxlen=self.console_entries)
+        self._buffers[page] = (network, console)
+
+        def on_response(response):
+            network.append({'ts': time.time(), 'method': response.request.method, 'url': response.url, 'status': response.status})
+
+        def on_request_failed(request):
+            network.append({'ts': time.time(), 'method': request.method, 'url': request.url, 'failure': request.failure})
+
+        def on_console(message):
+            console.append({'ts': time.time(), 'type': message.type, 'text': message.text})
+
+        page.on('response', on_response)
+        page.on('requestfailed', on_request_failed)
+        page.on('console', on_console)
+
+    def capture(self, page, step, error=None):
+        note, self.note = self.note, None
+        if not self.enabled or page is None:
+            return
+        if self._queue.full():
+            self.dropped += 1
+            return
+        if note is not None and error is None:
+            error = note[1]
+        network, console = self._buffers.get(page, ((), ()))
+        record = {
+            **current_context(),
+            'ts': time.time(),
+            'step': step,
+            'detail': note[0] if note is not None else None,
+            'error': str(error)[:500] if error is not None else None,
+            'network': list(network),
+            'console': list(console),
+        }
+        try:
+            record['url'] = page.url
+            # page.content() takes no timeout; the locator read fails fast mid-navigation.
+            record['dom'] = page.locator('html').evaluate("el => el.outerHTML", timeout=self.timeout).encode('utf-8')
+            if self.screenshot:
+                record['screenshot'] = page.screenshot(type='jpeg', quality=60, timeout=self.timeout)
+        except Exception as e:
+            record.setdefault('capture_error', str(e)[:200])
+
+        self._start_writer()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name='failure-capture', daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            try:
+                self._write(record)
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"   [CAPTURE] Could not save capture for {record.get('step')}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _store(self, data, suffix):
+        name = f"{hashlib.sha256(data).hexdigest()}{suffix}"
+        path = self.dir / name
+        if path.exists():
+            path.touch()
+        else:
+            tmp_path = path.with_suffix(suffix + '.tmp')
+            tmp_path.write_bytes(data)
+            tmp_path.replace(path)
+        return name
+
+    def _write(self, record):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        entry = {k: v for k, v in record.items() if k not in ('dom', 'screenshot', 'network', 'console')}
+        if record.get('dom'):
+            entry['dom'] = self._store(record['dom'], '.html')
+        if record.get('screenshot'):
+            entry['screenshot'] = self._store(record['screenshot'], '.jpg')
+        logs = {'network': record['network'], 'console': record['console']}
+        entry['logs'] = self._store(json.dumps(logs, ensure_ascii=False).encode('utf-8'), '.json')
+
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        enforce_size_cap(self.dir, self.max_bytes, self.index_path, ('dom', 'screenshot', 'logs'))
+
+    def flush(self, timeout=10):
+        """Waits (bounded) for queued captures to reach the disk."""
+        if self._writer is None:
+            return
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.05)
+
+
+# Process-wide capture, set up once per bot by configure_capture().
+_capture = FailureCapture({'enabled': False})
+
+
+def configure_capture(config, logger=None):
+    global _capture
+    _capture = FailureCapture(config.get('failure_capture') or {}, config.get('output_dir', 'output'), logger)
+    return _capture
+
+
+def attach_capture(page):
+    _capture.attach(page)
+
+
+def note_failure(detail, error=None):
+    """
+    Lets a page helper that swallows its own error say where it failed,
+    without reading the page: the step runner's capture carries the note.
+    """
+    _capture.note = (detail, error)
+
+
+def clear_failure_note():
+    _capture.note = None
+
+
+def capture_failure(page, step, error=None):
+    """Snapshots a failed step. Never raises, so it is safe inside except blocks."""
+    try:
+        _capture.capture(page, step, error)
+    except Exception:
+        pass
+
+
+@atexit.register
+def _flush_capture():
+    _capture.flush()
@@ -0,0 +1,161 @@
+import json
+import os
+import time
+import urllib.request
+from pathlib import Path
+
+from src.utils.filelock import FileLock
+
+# Markup WITS (or IIS in front of it) serves when it is down or throttling.
+ERROR_PAGE_MARKERS = (
+    'Service Unavailable',
+    'Server Error in',
+    'Too Many Requests',
+    'under maintenance',
+    'temporarily unavailable',
+    'Runtime Error',
+)
+
+
+class CircuitBreaker:
+    """
+    Site-wide circuit breaker for WITS. Every worker appends its item
+    outcomes to one window in a shared state file; when the failure rate or
+    median latency over that window crosses its threshold, or known error
+    pages end several of a worker's failures in a row, the breaker opens.
+    The open state lives in the same file so every worker sharing the
+    output_dir pauses, probing the site with exponential backoff until a
+    health probe passes and the breaker closes again.
+    """
+    def __init__(self, config, logger):
+        settings = config.get('circuit_breaker') or {}
+        self.logger = logger
+        self.enabled = settings.get('enabled', True)
+        self.window_size = int(settings.get('window', 10))
+        self.min_samples = int(settings.get('min_samples', 5))
+        self.failure_rate = float(settings.get('failure_rate', 0.6))
+        self.max_latency = settings.get('max_latency')
+        self.base_delay = float(settings.get('base_delay', 60))
+        self.max_delay = float(settings.get('max_delay', 30 * 60))
+        self.probe_url = settings.get('probe_url') or config['urls']['login']
+        # A single ASP.NET error page can be specific to one request.
+        self.error_page_hits = int(settings.get('error_page_hits', 2))
+        self.max_deferrals = int(settings.get('max_deferrals', 1))
+        self.consecutive_error_pages = 0
+        self.deferrals = {}
+        self.state_path = Path(config.get('output_dir', 'output')) / 'circuit.json'
+        self.lock = FileLock(self.state_path.with_suffix('.lock'), timeout=30, stale_after=30, poll=0.05)
+
+    def record(self, ok, duration, page=None):
+        """Records an item outcome. Returns True when this outcome opened the breaker."""
+        if not self.enabled:
+            return False
+        if ok:
+            self.consecutive_error_pages = 0
+        elif page is not None and is_error_page(page):
+            self.consecutive_error_pages += 1
+
+        with self.lock:
+            state = self._read_state()
+            window = (state.get('window') or [])[-(self.window_size - 1):] if self.window_size > 1 else []
+            window.append([bool(ok), round(duration, 3)])
+
+            reason = None
+            if self.consecutive_error_pages >= self.error_page_hits:
+                reason = f"{self.consecutive_error_pages} error pages in a row"
+            elif len(window) >= self.min_samples:
+                failures = sum(1 for item_ok, _ in window if not item_ok)
+                latencies = sorted(d for _, d in window)
+                median = latencies[len(latencies) // 2]
+                if failures / len(window) >= self.failure_rate:
+                    reason = f"failure rate {failures}/{len(window)}"
+                elif self.max_latency is not None and median > float(self.max_latency):
+                    reason = f"median latency {median:.0f}s"
+
+            if reason:
+                self._open(reason)
+            else:
+                self._write_state({**state, 'window': window})
+        return reason is not None
+
+    def open(self, reason):
+        with self.lock:
+            self._open(reason)
+
+    def _open(self, reason):
+        self.logger.warning(f"   [CIRCUIT] Opening circuit breaker: {reason}. Pausing all work.")
+        # The window starts over, so the outcomes that opened it cannot reopen it.
+        self._write_state({'state': 'open', 'reason': reason, 'opened_at': time.time(), 'window': []})
+        self.consecutive_error_pages = 0
+
+    def defer(self, item):
+        """
+        Counts a deferral of `item` past an opened breaker. Returns False once
+        it used up `max_deferrals`, so an item that keeps failing is recorded
+        as failed instead of being retried after every pause.
+        """
+        count = self.deferrals.get(item, 0)
+        if count >= self.max_deferrals:
+            return False
+        self.deferrals[item] = count + 1
+        return True
+
+    def is_open(self):
+        return self.enabled and self._read_state().get('state') == 'open'
+
+    def wait_until_closed(self):
+        """
+        Blocks while the breaker is open, probing WITS with exponential backoff.
+        Returns True when work was paused, so the caller can rebuild its session.
+        """
+        attempt = 0
+        paused = False
+        while self.is_open():
+            paused = True
+            delay = min(self.base_delay * (2 ** attempt), self.max_delay)
+            self.logger.warning(f"   [CIRCUIT] Breaker open. Probing WITS again in {delay:.0f}s...")
+            time.sleep(delay)
+            if not self.is_open():
+                break  # another worker's probe closed it
+            if self.probe():
+                self.logger.info("   [CIRCUIT] Health probe passed. Closing circuit breaker.")
+                with self.lock:
+                    self._write_state({'state': 'closed', 'closed_at': time.time(), 'window': []})
+                break
+            attempt += 1
+        return paused
+
+    def probe(self):
+        try:
+            request = urllib.request.Request(self.probe_url, headers={'User-Agent': 'Mozilla/5.0'})
+            with urllib.request.urlopen(request, timeout=30) as response:
+                body = response.read(200_000).decode('utf-8', errors='ignore')
+                return response.status == 200 and not any(m in body for m in ERROR_PAGE_MARKERS)
+        except Exception as e:
+            self.logger.info(f"   [CIRCUIT] Health probe failed: {e}")
+            return False
+
+    def _read_state(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_state(self, state):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+
+def is_error_page(page):
+    """True when the page shows one of the known WITS outage/throttling pages."""
+    try:
+        title = page.title()
+        body = page.locator('body').inner_text(timeout=2000)
+    except Exception:
+        return False
+    text = f"{title}\n{body[:5000]}"
+    return any(marker in text for marker in ERROR_PAGE_MARKERS)
@@ -1,10 +1,62 @@
-import yaml
 import os
+import pickle
 
-def load_config(config_path='config.yaml'):
-    """Loads the configuration from a YAML file."""
+# Bump when the snapshot layout or validation changes.
+SNAPSHOT_VERSION = 1
+REQUIRED_KEYS = ('credentials', 'query_name', 'urls', 'workflow', 'iso3_to_country')
+
+
+def validate_config(config, config_path='config.yaml'):
+    """Fails early on a config the bots cannot run with."""
+    if not isinstance(config, dict):
+        raise ValueError(f"{config_path} must contain a mapping")
+    missing = [key for key in REQUIRED_KEYS if key not in config]
+    if missing:
+        raise ValueError(f"{config_path} is missing: {', '.join(missing)}")
+    if not isinstance(config['iso3_to_country'], dict) or not config['iso3_to_country']:
+        raise ValueError(f"{config_path}: iso3_to_country must be a non-empty mapping")
+    return config
+
+
+def snapshot_path(config_path):
+    directory, name = os.path.split(os.path.abspath(config_path))
+    return os.path.join(directory, '.cache', f"{name}.pickle")
+
+
+def load_config(config_path='config.yaml', use_snapshot=True):
+    """
+    Loads the configuration from a YAML file.
+    The parsed and validated config is kept in a pickle snapshot keyed by the
+    file's path, mtime and size, so the frequent restarts skip YAML parsing.
+    """
     if not os.path.exists(config_path):
         raise FileNotFoundError(f"Configuration file not found at {config_path}")
-    
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
\ No newline at end of file
+
+    stat = os.stat(config_path)
+    key = (SNAPSHOT_VERSION, os.path.abspath(config_path), stat.st_mtime_ns, stat.st_size)
+    snapshot = snapshot_path(config_path)
+    if use_snapshot:
+        try:
+            with open(snapshot, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('key') == key:
+                return cached['config']
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, TypeError):
+            pass
+
+    # yaml is only imported when the snapshot is stale.
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = validate_config(yaml.load(f, Loader=loader), config_path)
+
+    if use_snapshot:
+        try:
+            os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+            tmp_path = f"{snapshot}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'key': key, 'config': config}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, snapshot)
+        except OSError:
+            pass
+    return config
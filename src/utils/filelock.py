@@ -0,0 +1,60 @@
+import os
+import time
+from pathlib import Path
+
+
+class FileLock:
+    """
+    Cross-process lock backed by an exclusively created lock file. Works on
+    any filesystem with atomic O_EXCL creation; a lock older than
+    `stale_after` seconds is treated as left behind by a killed process.
+    """
+    def __init__(self, path, timeout=300, stale_after=600, poll=0.5):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.poll = poll
+
+    def acquire(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                with os.fdopen(fd, 'w') as f:
+                    f.write(f"{os.getpid()}\n")
+                return
+            except FileExistsError:
+                try:
+                    if time.time() - self.path.stat().st_mtime > self.stale_after:
+                        self.path.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.time() > deadline:
+                    raise TimeoutError(f"Timed out waiting for lock {self.path}")
+                time.sleep(self.poll)
+
+    def release(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def append_lines(path, lines):
+    """
+    Appends lines to a progress list under its lock file, so workers on
+    several hosts sharing the file never interleave or lose writes.
+    """
+    path = Path(path)
+    with FileLock(path.with_name(path.name + '.lock'), timeout=60, stale_after=60, poll=0.05):
+        with open(path, 'a') as f:
+            f.writelines(f"{line}\n" for line in lines)
@@ -0,0 +1,75 @@
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+from src.utils.filelock import FileLock
+
+
+class SubmissionJournal:
+    """
+    Two-phase journal around the final submit. An intent is written (and
+    fsynced) before a query is submitted and a commit once the country is
+    recorded as done, so an intent without a commit marks a submission
+    whose outcome was lost to a crash and must be reconciled before the
+    country is submitted again. Appends and compaction take the same lock
+    file, so a compaction never drops another worker's records.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = FileLock(self.path.with_suffix('.lock'), timeout=60, stale_after=60, poll=0.05)
+
+    def _append(self, record):
+        with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def intent(self, query_name, country_code, members=None, after=None):
+        """`after` is the newest results-grid id known before the submit."""
+        entry_id = uuid.uuid4().hex
+        self._append({
+            'op': 'intent', 'id': entry_id, 'ts': time.time(),
+            'query': query_name, 'country': country_code, 'members': members or [query_name],
+            'after': after,
+        })
+        return entry_id
+
+    def commit(self, entry_id):
+        self._append({'op': 'commit', 'id': entry_id, 'ts': time.time()})
+
+    def abort(self, entry_id):
+        self._append({'op': 'abort', 'id': entry_id, 'ts': time.time()})
+
+    def pending(self):
+        """Intents that were neither committed nor aborted, oldest first."""
+        if not self.path.exists():
+            return []
+        intents = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a kill mid-write.
+                    continue
+                if record['op'] == 'intent':
+                    intents[record['id']] = record
+                else:
+                    intents.pop(record['id'], None)
+        return list(intents.values())
+
+    def compact(self):
+        """Rewrites the journal keeping only the unresolved intents."""
+        with self.lock:
+            pending = self.pending()
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in pending:
+                    f.write(json.dumps(record) + "\n")
+            os.replace(tmp_path, self.path)
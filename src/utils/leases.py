@@ -0,0 +1,235 @@
+import json
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def host_id():
+    return socket.gethostname()
+
+
+def worker_id():
+    return f"{host_id()}:{os.getpid()}"
+
+
+class SqliteLeaseStore:
+    """Leases in a SQLite database file, for workers on one host or a local disk."""
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS leases (item TEXT PRIMARY KEY, owner TEXT, expires REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS completions (item TEXT, host TEXT, status TEXT, ts REAL)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level='IMMEDIATE')
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def claim(self, item, owner, ttl):
+        # One statement, so the check and the claim cannot interleave with
+        # another worker's: the update only happens for our own or an expired lease.
+        now = time.time()
+        with self._connect() as db:
+            cur = db.execute(
+                "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT(item) DO UPDATE "
+                "SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.owner = excluded.owner OR leases.expires <= ?",
+                (item, owner, now + ttl, now),
+            )
+            return cur.rowcount == 1
+
+    def renew(self, item, owner, ttl):
+        with self._connect() as db:
+            cur = db.execute("UPDATE leases SET expires = ? WHERE item = ? AND owner = ?", (time.time() + ttl, item, owner))
+            return cur.rowcount == 1
+
+    def release(self, item, owner, status=None):
+        with self._connect() as db:
+            db.execute("DELETE FROM leases WHERE item = ? AND owner = ?", (item, owner))
+            if status:
+                db.execute("INSERT INTO completions VALUES (?, ?, ?, ?)", (item, owner.split(':')[0], status, time.time()))
+
+    def completions(self, since):
+        with self._connect() as db:
+            return db.execute("SELECT host, status, ts FROM completions WHERE ts >= ?", (since,)).fetchall()
+
+
+class FileLeaseStore:
+    """
+    Leases as one file per item on a shared filesystem. A lease is taken by
+    exclusive creation; an expired lease is taken over by atomically
+    replacing the file and reading it back to confirm the new owner.
+    """
+    def __init__(self, path):
+        self.root = Path(path)
+        self.lease_dir = self.root / 'leases'
+        self.lease_dir.mkdir(parents=True, exist_ok=True)
+        self.completions_dir = self.root / 'completions'
+        self.completions_dir.mkdir(parents=True, exist_ok=True)
+
+    def _lease_path(self, item):
+        return self.lease_dir / (item.replace('/', '_').replace(':', '__') + '.lease')
+
+    def _read(self, path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, path, owner, ttl, exclusive):
+        data = json.dumps({'owner': owner, 'expires': time.time() + ttl})
+        if exclusive:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+            return
+        tmp_path = path.with_suffix(f'.{owner.replace(":", "_")}.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def claim(self, item, owner, ttl):
+        path = self._lease_path(item)
+        try:
+            self._write(path, owner, ttl, exclusive=True)
+            return True
+        except FileExistsError:
+            pass
+        lease = self._read(path)
+        if lease and lease['owner'] != owner and lease['expires'] > time.time():
+            return False
+        self._write(path, owner, ttl, exclusive=False)
+        # Two workers may take over the same expired lease; the last writer wins.
+        time.sleep(0.2)
+        lease = self._read(path)
+        return bool(lease) and lease['owner'] == owner
+
+    def renew(self, item, owner, ttl):
+        path = self._lease_path(item)
+        lease = self._read(path)
+        if not lease or lease['owner'] != owner:
+            return False
+        self._write(path, owner, ttl, exclusive=False)
+        return True
+
+    def release(self, item, owner, status=None):
+        path = self._lease_path(item)
+        lease = self._read(path)
+        if lease and lease['owner'] == owner:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        if status:
+            host = owner.split(':')[0]
+            # One append-only file per host, so hosts never write the same file.
+            with open(self.completions_dir / f"{host}.jsonl", 'a') as f:
+                f.write(json.dumps({'item': item, 'status': status, 'ts': time.time()}) + "\n")
+
+    def completions(self, since):
+        rows = []
+        for path in self.completions_dir.glob('*.jsonl'):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record['ts'] >= since:
+                        rows.append((path.stem, record['status'], record['ts']))
+        return rows
+
+
+def open_lease_store(config):
+    settings = config.get('leasing') or {}
+    if settings.get('backend', 'sqlite') == 'files':
+        return FileLeaseStore(settings.get('path') or Path(config.get('output_dir', 'output')) / 'leases')
+    return SqliteLeaseStore(settings.get('path') or Path(config.get('output_dir', 'output')) / 'leases.db')
+
+
+class LeaseManager:
+    """
+    Lease-based coordination between workers on several hosts. Each item
+    (a query/country pair or a target id) is claimed with an expiring lease
+    that a background thread renews while the item is being worked on; a
+    worker that dies stops renewing, and its items return to the pool once
+    their lease expires. Disabled, every claim succeeds and nothing is stored.
+    """
+    def __init__(self, config, logger):
+        settings = config.get('leasing') or {}
+        self.logger = logger
+        self.enabled = settings.get('enabled', False)
+        self.ttl = float(settings.get('ttl', 600))
+        self.owner = worker_id()
+        self.store = open_lease_store(config) if self.enabled else None
+        self._held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._renewer = None
+
+    def scoped(self, filename):
+        """
+        Names a per-host state file. Hosts sharing output_dir each keep their
+        own (journal.jsonl -> journal.<host>.jsonl); host rather than process,
+        so a restarted worker finds what the previous one left.
+        """
+        if not self.enabled:
+            return filename
+        stem, dot, suffix = filename.rpartition('.')
+        return f"{stem}.{re.sub(r'[^A-Za-z0-9_-]+', '_', host_id())}{dot}{suffix}"
+
+    def claim(self, item):
+        if not self.enabled:
+            return True
+        if not self.store.claim(item, self.owner, self.ttl):
+            self.logger.info(f"   [LEASE] {item} is leased by another worker. Skipping.")
+            return False
+        with self._lock:
+            self._held.add(item)
+        self._ensure_renewer()
+        return True
+
+    def release(self, item, status=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._held.discard(item)
+        self.store.release(item, self.owner, status)
+
+    def _ensure_renewer(self):
+        if self._renewer is None or not self._renewer.is_alive():
+            self._renewer = threading.Thread(target=self._renew_loop, name='lease-renewer', daemon=True)
+            self._renewer.start()
+
+    def _renew_loop(self):
+        while not self._stop.wait(self.ttl / 3):
+            with self._lock:
+                held = list(self._held)
+            for item in held:
+                try:
+                    if not self.store.renew(item, self.owner, self.ttl):
+                        self.logger.warning(f"   [LEASE] Lost lease on {item}.")
+                except Exception as e:
+                    self.logger.warning(f"   [LEASE] Renewing {item} failed: {e}")
+
+
+def host_throughput(config, window=3600):
+    """Completed items per host over the last `window` seconds, from the shared lease store."""
+    if not (config.get('leasing') or {}).get('enabled', False):
+        return {}
+    per_host = {}
+    for host, status, _ in open_lease_store(config).completions(time.time() - window):
+        counts = per_host.setdefault(host, {})
+        counts[status] = counts.get(status, 0) + 1
+    return per_host
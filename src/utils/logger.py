@@ -1,14 +1,104 @@
 import os
 import sys
+import gzip
+import json
+import queue
+import random
+import shutil
+import atexit
 import logging
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-def setup_logger(name='wits_automation', log_dir='logs', log_file=None):
+# Structured fields attached to every record logged inside log_context().
+CONTEXT_FIELDS = ('query', 'country', 'target', 'job', 'step')
+_context = contextvars.ContextVar('wits_log_context', default={})
+
+# Pass as `extra=CHATTY` on per-step messages so they can be sampled.
+CHATTY = {'chatty': True}
+
+_listeners = {}
+
+
+@contextmanager
+def log_context(**fields):
+    """Adds query/country/target/step fields to every record logged in the block."""
+    token = _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context():
+    return dict(_context.get())
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of chatty records (marked CHATTY, or bare '='/'-' banner lines); warnings always pass."""
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        chatty = getattr(record, 'chatty', False)
+        if not chatty and isinstance(record.msg, str):
+            chatty = record.msg.strip() != '' and record.msg.strip().strip('=-') == ''
+        return not chatty or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        event = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage().strip(),
+        }
+        for key in CONTEXT_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                event[key] = value
+        if record.exc_text:
+            event['exc'] = record.exc_text
+        return json.dumps(event, ensure_ascii=False)
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def setup_logger(name='wits_automation', log_dir='logs', log_file=None, config=None):
+    """
+    Logs through a queue: the calling thread only enqueues the record and a
+    background listener does the formatting and I/O, so a slow disk or
+    terminal never stalls the automation. The file gets one JSON event per
+    line (with the log_context fields), rotated by size and gzip-compressed;
+    the console keeps the plain text format.
+    """
+    settings = (config or {}).get('logging') or {}
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
 
     # Clear handlers to avoid duplicates (safe re-init)
+    if name in _listeners:
+        _listeners.pop(name).stop()
     if logger.handlers:
         logger.handlers.clear()
+    logger.filters.clear()
 
     formatter = logging.Formatter(
         '%(asctime)s - %(levelname)s - %(message)s',
@@ -18,9 +108,9 @@ def setup_logger(name='wits_automation', log_dir='logs', log_file=None):
     # Console handler
     stream_handler = logging.StreamHandler(sys.stdout)
     stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
 
     # Ensure logs directory exists
+    log_dir = settings.get('dir', log_dir)
     os.makedirs(log_dir, exist_ok=True)
 
     # Log file path
@@ -30,8 +120,32 @@ def setup_logger(name='wits_automation', log_dir='logs', log_file=None):
     log_path = os.path.join(log_dir, log_file)
 
     # File handler
-    file_handler = logging.FileHandler(log_path, mode='a', encoding='utf-8')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    file_handler = RotatingFileHandler(
+        log_path, mode='a', encoding='utf-8',
+        maxBytes=int(settings.get('max_mb', 50)) * 1024 * 1024,
+        backupCount=int(settings.get('backup_count', 10)),
+    )
+    if settings.get('compress', True):
+        file_handler.namer = lambda path: path + '.gz'
+        file_handler.rotator = _gzip_rotator
+    file_handler.setFormatter(JsonFormatter() if settings.get('json', True) else formatter)
+
+    records = queue.SimpleQueue()
+    queue_handler = QueueHandler(records)
+    queue_handler.addFilter(SamplingFilter(float(settings.get('sample_rate', 1.0))))
+    logger.addFilter(ContextFilter())
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(records, stream_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    _listeners[name] = listener
 
     return logger
+
+
+@atexit.register
+def _stop_listeners():
+    # Flush whatever is still queued before the interpreter exits.
+    for listener in _listeners.values():
+        listener.stop()
+    _listeners.clear()
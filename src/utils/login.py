@@ -1,7 +1,14 @@
+import logging
+
+from src.utils.timeouts import measure, timeout_for
+from src.utils.timing import startup_probe
+from src.utils.capture import capture_failure
+
 class Login:
-    def __init__(self, page, config):
+    def __init__(self, page, config, logger=None):
         self.page = page
         self.config = config
+        self.logger = logger or logging.getLogger('wits_automation')
         
     def setup_creds(self):
         email = self.config['credentials']['email']
@@ -10,16 +17,20 @@ class Login:
     
     def perform_login(self):
         email, password = self.setup_creds()
-        self.page.goto(self.config['urls']['login'], timeout=30000)
+        startup_probe('login_goto')
+        with measure('login_goto'):
+            self.page.goto(self.config['urls']['login'], timeout=timeout_for('login_goto', 30000))
         self.page.fill('#UserNameTextBox', email)
         self.page.fill('#UserPassTextBox', password)
         self.page.click('#btnSubmit')
         self.page.wait_for_load_state('domcontentloaded')
         try:
-            self.page.wait_for_selector('text=Logout', timeout=10000)
-            print("Login successful.")    
+            with measure('login_check'):
+                self.page.wait_for_selector('text=Logout', timeout=timeout_for('login_check', 10000))
+            self.logger.info("Login successful.")
             return True  
-        except:
-            print("Login failed or took too long.")
+        except Exception as e:
+            self.logger.error("Login failed or took too long.")
+            capture_failure(self.page, 'login_check', e)
             return False
         
\ No newline at end of file
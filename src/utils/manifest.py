@@ -0,0 +1,102 @@
+import heapq
+import itertools
+import json
+import time
+from pathlib import Path
+
+FINAL_STATUSES = {'done', 'partial', 'failed', 'invalid'}
+
+
+class JobManifest:
+    """
+    Streams jobs from a JSONL manifest, one job per line:
+
+        {"job_id": "rerun-2010", "query": "Auto2010", "countries": ["USA", "CHN"], "priority": 5}
+        {"job_id": "fetch-batch", "targets": [2838895, 2838883]}
+
+    Jobs with `targets` belong to the download stage, the rest to the
+    execute stage; `countries` defaults to every country still missing.
+    The file is tailed while running, so appended jobs are picked up
+    without a restart, highest priority first. Per-job status is appended
+    to a sidecar <manifest>.status.jsonl, and jobs with a final status
+    there are not run again.
+    """
+    def __init__(self, config, stage, logger):
+        settings = config.get('manifest') or {}
+        self.path = Path(settings['path'])
+        self.status_path = self.path.with_suffix('.status.jsonl')
+        self.stage = stage
+        self.logger = logger
+        self.poll_interval = float(settings.get('poll_interval', 30))
+        self.idle_exit = settings.get('idle_exit')
+        self.offset = 0
+        self.queue = []
+        self.counter = itertools.count()
+        self.finished = self._load_finished()
+
+    def _load_finished(self):
+        finished = set()
+        if self.status_path.exists():
+            with open(self.status_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get('status') in FINAL_STATUSES:
+                        finished.add(record['job_id'])
+        return finished
+
+    def poll(self):
+        """Reads lines appended since the last poll; a partially written last line waits for the next one."""
+        if not self.path.exists():
+            return 0
+        added = 0
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break
+                self.offset += len(raw)
+                line = raw.decode('utf-8').strip()
+                if not line:
+                    continue
+                try:
+                    job = json.loads(line)
+                except ValueError:
+                    self.logger.warning(f"   [MANIFEST] Ignoring malformed line: {line[:80]}")
+                    continue
+                job_id = job.get('job_id')
+                stage = 'download' if 'targets' in job else 'execute'
+                if not job_id or stage != self.stage or job_id in self.finished:
+                    continue
+                if stage == 'execute' and not job.get('query'):
+                    self.set_status(job_id, 'invalid', reason='execute jobs need a query')
+                    continue
+                heapq.heappush(self.queue, (-int(job.get('priority', 0)), next(self.counter), job))
+                added += 1
+        return added
+
+    def jobs(self):
+        """Yields jobs in priority order, tailing the manifest until it stays idle for `idle_exit` seconds."""
+        idle_since = time.time()
+        while True:
+            self.poll()
+            if self.queue:
+                _, _, job = heapq.heappop(self.queue)
+                if job['job_id'] in self.finished:
+                    continue
+                yield job
+                idle_since = time.time()
+                continue
+            if self.idle_exit is not None and time.time() - idle_since >= float(self.idle_exit):
+                self.logger.info("   [MANIFEST] No new jobs. Stopping.")
+                return
+            time.sleep(self.poll_interval)
+
+    def set_status(self, job_id, status, **details):
+        record = {'job_id': job_id, 'status': status, 'ts': time.time(), **details}
+        with open(self.status_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+        if status in FINAL_STATUSES:
+            self.finished.add(job_id)
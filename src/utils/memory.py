@@ -0,0 +1,92 @@
+import os
+
+try:
+    import psutil
+except ImportError:  # RSS sampling is skipped without psutil
+    psutil = None
+
+MB = 1024 * 1024
+
+
+class MemoryMonitor:
+    """
+    Samples the page's JS heap and DOM node count and the RSS of the browser
+    processes every `sample_every` items, and says what to recycle once a
+    configured threshold is exceeded: 'page' for heap/DOM growth, 'context'
+    for browser RSS growth.
+    """
+    def __init__(self, config, logger):
+        settings = config.get('memory') or {}
+        self.logger = logger
+        self.sample_every = int(settings.get('sample_every', 10))
+        self.max_js_heap_mb = settings.get('max_js_heap_mb')
+        self.max_dom_nodes = settings.get('max_dom_nodes')
+        self.max_rss_mb = settings.get('max_rss_mb')
+        self.items = 0
+
+    def check(self, page):
+        self.items += 1
+        if self.sample_every <= 0 or self.items % self.sample_every:
+            return None
+
+        sample = self.sample(page)
+        self.logger.info(
+            f"   [MEMORY] JS heap: {_fmt(sample['js_heap_mb'])} MB | DOM nodes: {_fmt(sample['dom_nodes'])} "
+            f"| Browser RSS: {_fmt(sample['rss_mb'])} MB"
+        )
+        if _over(sample['rss_mb'], self.max_rss_mb):
+            return 'context'
+        if _over(sample['js_heap_mb'], self.max_js_heap_mb) or _over(sample['dom_nodes'], self.max_dom_nodes):
+            return 'page'
+        return None
+
+    def sample(self, page):
+        sample = {'js_heap_mb': None, 'dom_nodes': None, 'rss_mb': browser_rss_mb()}
+        try:
+            # CDP counts detached nodes too, which is where leaks show up.
+            session = page.context.new_cdp_session(page)
+            try:
+                session.send('Performance.enable')
+                metrics = {m['name']: m['value'] for m in session.send('Performance.getMetrics')['metrics']}
+            finally:
+                session.detach()
+            sample['js_heap_mb'] = metrics.get('JSHeapUsedSize', 0) / MB
+            sample['dom_nodes'] = metrics.get('Nodes')
+        except Exception:
+            try:
+                info = page.evaluate("""
+                    () => ({
+                        heap: performance.memory ? performance.memory.usedJSHeapSize : null,
+                        nodes: document.getElementsByTagName('*').length
+                    })
+                """)
+                sample['js_heap_mb'] = info['heap'] / MB if info['heap'] is not None else None
+                sample['dom_nodes'] = info['nodes']
+            except Exception as e:
+                self.logger.warning(f"   [MEMORY] Page sampling failed: {e}")
+        return sample
+
+
+def browser_rss_mb():
+    """RSS of every process spawned by this one (Playwright driver and browser)."""
+    if psutil is None:
+        return None
+    try:
+        children = psutil.Process(os.getpid()).children(recursive=True)
+        total = 0
+        for child in children:
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / MB
+    except psutil.Error:
+        return None
+
+
+def _over(value, limit):
+    return value is not None and limit is not None and value > limit
+
+
+def _fmt(value):
+    return f"{value:.0f}" if value is not None else "n/a"
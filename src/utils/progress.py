@@ -0,0 +1,131 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from src.utils.leases import host_throughput
+
+EVENTS_FILE = 'progress_events.jsonl'
+RATE_WINDOWS = {'15m': 15 * 60, '1h': 3600, '6h': 6 * 3600, '24h': 24 * 3600}
+
+
+def record_event(output_dir, stage, status, **fields):
+    """Appends one timestamped progress event; the txt lists stay the source of truth."""
+    path = Path(output_dir) / EVENTS_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    event = {'ts': round(time.time(), 3), 'stage': stage, 'status': status, **fields}
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(event) + "\n")
+
+
+def read_recent_events(path, since, block_size=64 * 1024):
+    """
+    Reads events newer than `since` by scanning the file backwards in blocks,
+    so the cost depends on the size of the window, not on the whole history.
+    """
+    if not os.path.exists(path):
+        return []
+    events = []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        remainder = b''
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + remainder
+            lines = chunk.split(b'\n')
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                event = _parse(line)
+                if event is None:
+                    continue
+                if event['ts'] < since:
+                    return events
+                events.append(event)
+        event = _parse(remainder)
+        if event is not None and event['ts'] >= since:
+            events.append(event)
+    return events
+
+
+def _parse(line):
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def _read_ids(path):
+    if not path.exists():
+        return set()
+    with open(path, 'r') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def build_report(config, now=None):
+    now = now or time.time()
+    output_dir = Path(config.get('output_dir', 'output'))
+    all_countries = set(config['iso3_to_country'].keys())
+    query_names = config['query_name']
+    if isinstance(query_names, str):
+        query_names = [query_names]
+
+    queries = {}
+    for query_name in query_names:
+        done = _read_ids(output_dir / 'queries' / 'done' / f"{query_name}.txt") & all_countries
+        failed = _read_ids(output_dir / 'queries' / 'failed' / f"{query_name}.txt") - done
+        queries[query_name] = {
+            'done': len(done),
+            'failed': len(failed),
+            'remaining': len(all_countries - done),
+        }
+
+    download_dir = output_dir / 'download'
+    download = {
+        'done': len(_read_ids(download_dir / 'done_targets.txt')),
+        'skipped': len(_read_ids(download_dir / 'skipped_targets.txt')),
+        'failed': len(_read_ids(download_dir / 'failed_targets.txt')),
+    }
+
+    events = read_recent_events(output_dir / EVENTS_FILE, now - max(RATE_WINDOWS.values()))
+    rates = {}
+    for stage in ('execute', 'download'):
+        stage_events = [e for e in events if e['stage'] == stage and e['status'] != 'failed']
+        rates[stage] = {
+            label: round(sum(1 for e in stage_events if e['ts'] >= now - seconds) / (seconds / 3600), 2)
+            for label, seconds in RATE_WINDOWS.items()
+        }
+
+    remaining = sum(q['remaining'] for q in queries.values())
+    return {
+        'generated_at': _iso(now),
+        'queries': queries,
+        'execute': {
+            'done': sum(q['done'] for q in queries.values()),
+            'failed': sum(q['failed'] for q in queries.values()),
+            'remaining': remaining,
+            'rate_per_hour': rates['execute'],
+            'eta': _eta(remaining, rates['execute'], now),
+        },
+        'download': {**download, 'rate_per_hour': rates['download']},
+        'hosts_last_hour': host_throughput(config),
+    }
+
+
+def _eta(remaining, rates, now):
+    if remaining == 0:
+        return _iso(now)
+    # Prefer the shortest window that saw any work: it tracks the current pace.
+    for label in RATE_WINDOWS:
+        if rates[label] > 0:
+            return _iso(now + remaining / rates[label] * 3600)
+    return None
+
+
+def _iso(ts):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(ts))
@@ -0,0 +1,30 @@
+import json
+
+
+def enforce_size_cap(directory, max_bytes, index_path, keys):
+    """
+    Keeps a capture directory under `max_bytes` by deleting its oldest files,
+    then drops the index.jsonl entries none of whose files (named under
+    `keys`) are left. Shared by the trace sampler and the failure capture.
+    """
+    files = sorted(
+        (p for p in directory.iterdir() if p.is_file() and p != index_path and p.suffix != '.tmp'),
+        key=lambda p: p.stat().st_mtime,
+    )
+    total = sum(p.stat().st_size for p in files)
+    removed = False
+    while files and total > max_bytes:
+        oldest = files.pop(0)
+        total -= oldest.stat().st_size
+        oldest.unlink()
+        removed = True
+    if not removed or not index_path.exists():
+        return
+
+    remaining = {p.name for p in files}
+    with open(index_path, 'r', encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    kept = [e for e in entries if any(e.get(key) in remaining for key in keys)]
+    with open(index_path, 'w', encoding='utf-8') as f:
+        for entry in kept:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
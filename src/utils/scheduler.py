@@ -0,0 +1,99 @@
+import json
+import statistics
+from pathlib import Path
+
+from src.utils.progress import EVENTS_FILE
+
+
+class CountryScheduler:
+    """
+    Orders the countries of a query by expected cost instead of
+    alphabetically. A country's cost is its median past processing time
+    (from the progress events), and its extract size is its configured
+    weight. Cheap countries go first, countries that only ever failed
+    (no data on WITS) go last, heavy reporters are spread evenly through
+    the run, and the order is cut into batches whose total size stays
+    within the configured budget; the bot pauses between batches.
+    """
+    def __init__(self, config, logger):
+        settings = config.get('scheduling') or {}
+        self.logger = logger
+        self.enabled = settings.get('enabled', False)
+        self.weights = settings.get('size_weights') or {}
+        self.heavy_weight = float(settings.get('heavy_weight', 3))
+        self.batch_budget = float(settings.get('batch_budget', 3))
+        self.output_dir = Path(config.get('output_dir', 'output'))
+
+    def load_history(self):
+        """Per-country past durations and failure/success counts across all queries."""
+        durations, failures, successes = {}, {}, {}
+        path = self.output_dir / EVENTS_FILE
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if event.get('stage') != 'execute' or 'country' not in event:
+                        continue
+                    if event['status'] == 'done' and event.get('duration'):
+                        durations.setdefault(event['country'], []).append(event['duration'])
+
+        # The done/failed lists predate the events file and hold the no-data history.
+        for counts, kind in ((successes, 'done'), (failures, 'failed')):
+            for list_file in (self.output_dir / 'queries' / kind).glob('*.txt'):
+                with open(list_file, 'r') as f:
+                    for country in {line.strip() for line in f if line.strip()}:
+                        counts[country] = counts.get(country, 0) + 1
+        return durations, failures, successes
+
+    def plan(self, countries):
+        """Returns the countries as a list of batches (lists), in processing order."""
+        countries = sorted(countries)
+        if not self.enabled:
+            return [countries[i:i + 3] for i in range(0, len(countries), 3)]
+
+        durations, failures, successes = self.load_history()
+        medians = {c: statistics.median(d) for c, d in durations.items()}
+        default_cost = statistics.median(medians.values()) if medians else 0
+
+        def cost(country):
+            return medians.get(country, default_cost) * self.weight(country)
+
+        def no_data(country):
+            return failures.get(country, 0) > 0 and successes.get(country, 0) == 0
+
+        light = sorted((c for c in countries if not self.is_heavy(c)), key=lambda c: (no_data(c), cost(c), c))
+        heavy = sorted((c for c in countries if self.is_heavy(c)), key=lambda c: (cost(c), c))
+
+        # Spread the heavy reporters evenly through the light ones.
+        ordered = list(light)
+        if heavy:
+            gap = max(1, len(light) // len(heavy))
+            for i, country in enumerate(heavy):
+                ordered.insert(min(len(ordered), gap // 2 + i * (gap + 1)), country)
+
+        batches, batch, used = [], [], 0.0
+        for country in ordered:
+            weight = self.weight(country)
+            heavy_in_batch = any(self.is_heavy(c) for c in batch)
+            if batch and (used + weight > self.batch_budget or (self.is_heavy(country) and heavy_in_batch)):
+                batches.append(batch)
+                batch, used = [], 0.0
+            batch.append(country)
+            used += weight
+        if batch:
+            batches.append(batch)
+
+        self.logger.info(
+            f"   -> Scheduled {len(ordered)} countries in {len(batches)} batches "
+            f"({len(heavy)} heavy, {sum(1 for c in light if no_data(c))} with no-data history last)."
+        )
+        return batches
+
+    def weight(self, country):
+        return float(self.weights.get(country, 1))
+
+    def is_heavy(self, country):
+        return self.weight(country) >= self.heavy_weight
@@ -0,0 +1,103 @@
+import threading
+from pathlib import Path
+
+from src.utils.capture import capture_failure, clear_failure_note
+from src.utils.filelock import FileLock
+
+LOGIN_URL_MARKER = 'Login.aspx'
+LOGIN_MARKUP_MARKER = 'UserNameTextBox'
+
+
+class SessionGuard:
+    """
+    Detects a WITS session that timed out mid-run (a redirect to Login.aspx
+    or login markup in a page response) and re-authenticates in place.
+    Re-logins are single-flight: threads of one worker share a single login,
+    and workers on the same machine take turns through a lock file instead
+    of all logging in at once.
+    """
+    def __init__(self, config, logger, login):
+        self.logger = logger
+        self.login = login
+        self.expired = False
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(Path(config.get('output_dir', 'output')) / '.login.lock', timeout=300)
+
+    def attach(self, page):
+        """Watches a page's main-frame navigations and document responses."""
+        def on_navigated(frame):
+            if frame == page.main_frame and LOGIN_URL_MARKER in frame.url:
+                self.expired = True
+
+        def on_response(response):
+            try:
+                if response.request.resource_type != 'document' or response.frame != page.main_frame:
+                    return
+                if LOGIN_URL_MARKER in response.url or LOGIN_MARKUP_MARKER in response.text():
+                    self.expired = True
+            except Exception:
+                pass
+
+        page.on('framenavigated', on_navigated)
+        page.on('response', on_response)
+
+    def mark_logged_in(self):
+        self.expired = False
+
+    def is_expired(self, page):
+        if self.expired:
+            return True
+        try:
+            return LOGIN_URL_MARKER in page.url
+        except Exception:
+            return False
+
+    def run(self, page_getter, fn, *args, restore=None, ok=bool, **kwargs):
+        """
+        Runs one step. When it fails (an exception, or a result `ok` rejects:
+        False/None by default) and the session turns out to have expired,
+        logs in again, calls `restore` to get back to where the step expects
+        to be, and replays the step once.
+        Any other failure is captured here, once; the page helpers only note
+        where they failed.
+        """
+        generation = self.generation
+        step = getattr(fn, '__name__', 'step')
+        clear_failure_note()
+        try:
+            result = fn(*args, **kwargs)
+            error = None
+        except Exception as e:
+            result, error = None, e
+
+        succeeded = error is None and ok(result)
+        if succeeded or not self.is_expired(page_getter()):
+            if not succeeded:
+                capture_failure(page_getter(), step, error)
+            if error is not None:
+                raise error
+            return result
+
+        self.logger.warning(f"   [SESSION] Session expired during {step}. Re-authenticating...")
+        if not self.relogin(generation):
+            self.logger.error("   [SESSION] Re-login failed.")
+            if error is not None:
+                raise error
+            return result
+        if restore is not None:
+            restore()
+        self.logger.info("   [SESSION] Replaying interrupted step.")
+        return fn(*args, **kwargs)
+
+    def relogin(self, seen_generation):
+        with self._lock:
+            if self.generation != seen_generation and not self.expired:
+                # Another thread logged in while this one waited.
+                return True
+            with self._file_lock:
+                ok = bool(self.login())
+            if ok:
+                self.generation += 1
+                self.expired = False
+            return ok
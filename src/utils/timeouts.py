@@ -0,0 +1,106 @@
+import atexit
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class TimeoutPolicy:
+    """
+    Learns each step's timeout from its observed latency. Every measured
+    wait is recorded per step; once a step has `min_samples`, its timeout is
+    the configured percentile plus a relative margin, clamped to the step's
+    floor and ceiling. Until then the hard-coded default is used. Samples
+    are persisted so the distributions carry over across runs.
+    """
+    def __init__(self, settings=None, path=None):
+        settings = settings or {}
+        self.enabled = settings.get('enabled', True)
+        self.percentile = float(settings.get('percentile', 95))
+        self.margin = float(settings.get('margin', 0.5))
+        self.floor = int(settings.get('floor', 2000))
+        self.ceiling = int(settings.get('ceiling', 60000))
+        self.min_samples = int(settings.get('min_samples', 20))
+        self.max_samples = int(settings.get('max_samples', 500))
+        self.step_bounds = settings.get('steps') or {}
+        self.save_every = int(settings.get('save_every', 25))
+        self.path = Path(path) if path else None
+        self.samples = self._load()
+        self.unsaved = {}
+
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f).get('samples', {})
+        except (OSError, ValueError):
+            return {}
+
+    def timeout(self, step, default):
+        samples = self.samples.get(step, [])
+        if not self.enabled or len(samples) < self.min_samples:
+            return default
+        ordered = sorted(samples)
+        idx = min(len(ordered) - 1, int(round(self.percentile / 100 * (len(ordered) - 1))))
+        bounds = self.step_bounds.get(step) or {}
+        floor = int(bounds.get('floor', self.floor))
+        ceiling = int(bounds.get('ceiling', self.ceiling))
+        return int(min(ceiling, max(floor, ordered[idx] * (1 + self.margin))))
+
+    @contextmanager
+    def measure(self, step):
+        # Waits that time out are recorded too: their elapsed time is the
+        # budget itself, which lifts the percentile when steps keep timing out.
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(step, (time.perf_counter() - start) * 1000)
+
+    def record(self, step, elapsed_ms):
+        elapsed_ms = round(elapsed_ms, 1)
+        samples = self.samples.setdefault(step, [])
+        samples.append(elapsed_ms)
+        del samples[:-self.max_samples]
+        self.unsaved.setdefault(step, []).append(elapsed_ms)
+        if self.path and sum(len(v) for v in self.unsaved.values()) >= self.save_every:
+            self.save()
+
+    def save(self):
+        """Merges this worker's new samples into the stored distributions."""
+        if not self.path or not self.unsaved:
+            return
+        stored = self._load()
+        for step, new in self.unsaved.items():
+            stored[step] = (stored.get(step, []) + new)[-self.max_samples:]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'updated_at': time.time(), 'samples': stored}, f)
+        os.replace(tmp_path, self.path)
+        self.samples = stored
+        self.unsaved = {}
+
+
+# Process-wide policy; helpers in src/wits read it without threading it
+# through every call. Until configured, the defaults are used unchanged.
+_policy = TimeoutPolicy({'enabled': False})
+
+
+def configure_timeouts(config):
+    global _policy
+    settings = config.get('timeouts') or {}
+    path = Path(config.get('output_dir', 'output')) / 'timeouts.json'
+    _policy = TimeoutPolicy(settings, path)
+    atexit.register(_policy.save)
+    return _policy
+
+
+def timeout_for(step, default):
+    return _policy.timeout(step, default)
+
+
+def measure(step):
+    return _policy.measure(step)
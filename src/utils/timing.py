@@ -0,0 +1,83 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.utils.logger import log_context
+
+
+class StepTimer:
+    """
+    Records the wall-clock latency of named automation steps.
+    Each step is appended as one JSON line to `path` (when given) so runs
+    can be compared with `benchmark.py compare`.
+    """
+    def __init__(self, path=None, label=None):
+        self.path = Path(path) if path else None
+        self.label = label
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def step(self, name, **tags):
+        start = time.perf_counter()
+        outcome = {'ok': True}
+        try:
+            with log_context(step=name):
+                yield outcome
+        except Exception:
+            outcome['ok'] = False
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, outcome['ok'], **tags)
+
+    def record(self, name, duration, ok=True, **tags):
+        record = {'step': name, 'duration': round(duration, 4), 'ok': bool(ok), 'ts': time.time()}
+        if self.label:
+            record['label'] = self.label
+        record.update(tags)
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+
+def startup_probe(action):
+    """
+    Set by `benchmark.py startup`: records the moment the process reaches its
+    first browser action to the file named in WITS_STARTUP_PROBE, then exits.
+    """
+    path = os.environ.get('WITS_STARTUP_PROBE')
+    if not path:
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'action': action, 'ts': time.time()}, f)
+    os._exit(0)
+
+
+def timer_from_config(config):
+    """Builds the StepTimer configured under `benchmark` (no file output by default)."""
+    settings = config.get('benchmark') or {}
+    return StepTimer(settings.get('timings_path'), settings.get('label'))
+
+
+def load_timings(path):
+    """Groups the durations of a timings file by step name."""
+    steps = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            steps.setdefault(record['step'], []).append(record['duration'])
+    return steps
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
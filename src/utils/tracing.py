@@ -0,0 +1,94 @@
+import cProfile
+import json
+import random
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.utils.ringdir import enforce_size_cap
+
+
+class TraceSampler:
+    """
+    Captures a Playwright trace (snapshots, network, console) and a cProfile
+    dump for a sample of items, and for every item slower than the latency
+    threshold. Captures live in a size-capped ring directory indexed by
+    query/country or target id in index.jsonl.
+    """
+    def __init__(self, config, logger):
+        settings = config.get('tracing') or {}
+        self.logger = logger
+        self.enabled = settings.get('enabled', False)
+        self.sample_rate = float(settings.get('sample_rate', 0.0))
+        self.latency_threshold = settings.get('latency_threshold')
+        self.max_bytes = int(settings.get('max_mb', 500)) * 1024 * 1024
+        self.trace_dir = Path(settings.get('dir') or Path(config.get('output_dir', 'output')) / 'traces')
+        self.index_path = self.trace_dir / 'index.jsonl'
+        self._traced_context = None
+
+    @contextmanager
+    def capture(self, context, key, **tags):
+        sampled = random.random() < self.sample_rate
+        # Slow items are only known afterwards, so a threshold means every
+        # item is recorded and the chunk is discarded when it was fast.
+        if not self.enabled or not (sampled or self.latency_threshold is not None):
+            yield
+            return
+
+        tracing = self._start_chunk(context, key)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - start
+            reason = None
+            if sampled:
+                reason = 'sampled'
+            elif duration >= float(self.latency_threshold):
+                reason = 'slow'
+            self._finish(tracing, profiler, key, reason, duration, tags)
+
+    def _start_chunk(self, context, key):
+        try:
+            if self._traced_context is not context:
+                context.tracing.start(screenshots=True, snapshots=True)
+                self._traced_context = context
+            context.tracing.start_chunk(title=key)
+            return context.tracing
+        except Exception as e:
+            self.logger.warning(f"   [TRACE] Could not start trace for {key}: {e}")
+            return None
+
+    def _finish(self, tracing, profiler, key, reason, duration, tags):
+        if reason is None:
+            if tracing is not None:
+                try:
+                    tracing.stop_chunk()
+                except Exception:
+                    pass
+            return
+
+        self.trace_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9_-]+', '_', key)}"
+        entry = {'key': key, 'reason': reason, 'duration': round(duration, 3), 'ts': time.time(), **tags}
+
+        if tracing is not None:
+            trace_path = self.trace_dir / f"{stem}.zip"
+            try:
+                tracing.stop_chunk(path=str(trace_path))
+                entry['trace'] = trace_path.name
+            except Exception as e:
+                self.logger.warning(f"   [TRACE] Could not save trace for {key}: {e}")
+
+        profile_path = self.trace_dir / f"{stem}.prof"
+        profiler.dump_stats(str(profile_path))
+        entry['profile'] = profile_path.name
+
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+        self.logger.info(f"   [TRACE] Captured {reason} trace for {key} ({duration:.2f}s) -> {stem}")
+        enforce_size_cap(self.trace_dir, self.max_bytes, self.index_path, ('trace', 'profile'))
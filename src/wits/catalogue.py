@@ -0,0 +1,142 @@
+import json
+import time
+from pathlib import Path
+
+from src.wits.handlers import ensure_popup_closed
+from src.wits.navigation import navigate_to_advanced_query, select_existing_query
+from src.wits.reporter import click_cancel
+
+# Every 'Name -- ISO' label in the Country List frame: ids, values, titles
+# and leaf text, so the available countries are read along with the
+# query's current selection, whatever element WITS renders them in.
+COLLECT_COUNTRY_LABELS = """
+() => {
+    const pattern = /^\\s*.+? -- [A-Z0-9]{3}\\s*$/;
+    const labels = new Set();
+    for (const el of document.querySelectorAll('*')) {
+        const leafText = el.children.length === 0 ? el.textContent : null;
+        for (const value of [el.id, el.getAttribute('value'), el.getAttribute('title'), leafText]) {
+            if (value && pattern.test(value)) {
+                labels.add(value.trim());
+                break;
+            }
+        }
+    }
+    return Array.from(labels);
+}
+"""
+
+
+def fetch_country_ids(page, logger, query_name):
+    """
+    Opens the reporter Country List of a saved query and returns every
+    'Name -- ISO' label it offers, exactly as WITS renders them, then
+    closes the modal again.
+    """
+    if not navigate_to_advanced_query(page, logger) or not select_existing_query(page, query_name, logger):
+        return []
+
+    def handle_dialog(dialog):
+        dialog.accept()
+
+    modify_link = page.locator('#divRptrmodify a')
+    page.on("dialog", handle_dialog)
+    try:
+        modify_link.wait_for(state='visible', timeout=10000)
+        modify_link.click()
+        page.wait_for_load_state('networkidle')
+        ensure_popup_closed(page, logger)
+    except Exception as e:
+        logger.warning(f"   [CATALOGUE] Could not open the Country List: {e}")
+        return []
+    finally:
+        page.remove_listener("dialog", handle_dialog)
+
+    try:
+        frame = page.locator('iframe[src*="CountryList.aspx"]').element_handle(timeout=10000).content_frame()
+        frame.wait_for_load_state('domcontentloaded')
+        return frame.evaluate(COLLECT_COUNTRY_LABELS)
+    except Exception as e:
+        logger.warning(f"   [CATALOGUE] Could not read the Country List: {e}")
+        return []
+    finally:
+        try:
+            click_cancel(page, logger)
+        except Exception as e:
+            logger.warning(f"   [CATALOGUE] Could not close the Country List: {e}")
+
+
+def parse_country_ids(item_ids):
+    """Maps each ISO3 code to its list-item id."""
+    catalogue = {}
+    for item_id in item_ids:
+        name, sep, code = item_id.rpartition(' -- ')
+        if sep and code.strip():
+            catalogue[code.strip()] = item_id
+    return catalogue
+
+
+class CountryCatalogue:
+    """
+    The canonical WITS country list, cached on disk and refreshed after
+    `max_age_days`. It maps ISO3 codes to the exact Country List item ids,
+    so the reporter is verified with one exact lookup and codes WITS does
+    not know are rejected before any browser work is spent on them.
+    """
+    def __init__(self, config, logger):
+        settings = config.get('country_catalogue') or {}
+        self.logger = logger
+        self.enabled = settings.get('enabled', True)
+        self.max_age = float(settings.get('max_age_days', 30)) * 86400
+        self.path = Path(settings.get('path') or Path(config.get('output_dir', 'output')) / 'cache' / 'countries.json')
+        # A list much shorter than the configured countries is the query's
+        # selection rather than the catalogue, and is never cached.
+        self.min_size = int(float(settings.get('min_share', 0.8)) * len(config.get('iso3_to_country') or {}))
+        self.countries = None
+
+    def _read_cache(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def ensure(self, page, query_name):
+        """Loads the cached catalogue, fetching it from WITS when missing or stale."""
+        if not self.enabled:
+            return
+        cached = self._read_cache()
+        if cached and time.time() - cached.get('fetched_at', 0) < self.max_age:
+            self.countries = cached['countries']
+            return
+
+        self.logger.info("   [CATALOGUE] Fetching the WITS country list...")
+        countries = parse_country_ids(fetch_country_ids(page, self.logger, query_name))
+        if countries and len(countries) < self.min_size:
+            self.logger.warning(
+                f"   [CATALOGUE] Read only {len(countries)} countries (expected at least {self.min_size}). Not caching."
+            )
+            countries = {}
+        if countries:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': time.time(), 'countries': countries}, f, ensure_ascii=False, indent=1)
+            self.countries = countries
+            self.logger.info(f"   [CATALOGUE] Cached {len(countries)} countries to {self.path}.")
+        elif cached:
+            self.logger.warning("   [CATALOGUE] Refresh failed. Using the stale cached catalogue.")
+            self.countries = cached['countries']
+        else:
+            self.logger.warning("   [CATALOGUE] No catalogue available. Falling back to config names.")
+
+    def known(self, country_codes):
+        """Splits codes into (known, unknown); everything is known without a catalogue."""
+        if self.countries is None:
+            return set(country_codes), set()
+        known = {code for code in country_codes if code in self.countries}
+        return known, set(country_codes) - known
+
+    def item_id(self, country_code):
+        if self.countries is None:
+            return None
+        return self.countries.get(country_code)
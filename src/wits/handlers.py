@@ -1,5 +1,8 @@
 import logging
+import weakref
 
+# Pages that already carry the auto-close locator handler.
+_auto_close_pages = weakref.WeakSet()
 
 
 def handle_dialog(dialog, logger):
@@ -28,7 +31,9 @@ def ensure_popup_closed(page, logger):
                     btn.click()
                     page.wait_for_timeout(200)
                     return
-            except: pass
+            except Exception:
+                # Detached or cross-origin frames; the popup is not in them.
+                pass
     except Exception:
         pass
 
@@ -36,12 +41,17 @@ def setup_auto_close_popup(page, logger):
     """
     Registers a global handler that automatically clicks 'No, thanks.' 
     whenever the World Bank feedback modal appears.
+    Safe to call repeatedly: the handler is added once per page.
     """
+    if page in _auto_close_pages:
+        return
+
     no_thanks_locator = page.get_by_role("button", name="No, thanks.")
     
     try:
         page.add_locator_handler(no_thanks_locator, lambda: (
             no_thanks_locator.click()
         ))
+        _auto_close_pages.add(page)
     except Exception as e:
         logger.warning(f"   [POPUP] Warning: Auto-popup handler registration failed: {e}")
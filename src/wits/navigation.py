@@ -2,6 +2,8 @@
 from src.wits.handlers import ensure_popup_closed, setup_auto_close_popup
 
 from src.wits.handlers import ensure_popup_closed, setup_auto_close_popup
+from src.utils.timeouts import measure, timeout_for
+from src.utils.capture import note_failure
 
 
 def navigate_to_results(page, logger):
@@ -10,16 +12,19 @@ def navigate_to_results(page, logger):
     page.wait_for_load_state('domcontentloaded')
     try:
         results_menu = page.locator('a.dropdown-toggle:has-text("Results")').first
-        results_menu.hover(timeout=5000) 
+        with measure('results_menu_hover'):
+            results_menu.hover(timeout=timeout_for('results_menu_hover', 5000))
         ensure_popup_closed(page, logger)
         trade_data_link = page.locator('#TopMenu1_DownloadandViewResults')
-        trade_data_link.wait_for(state='visible', timeout=5000)
+        with measure('results_link'):
+            trade_data_link.wait_for(state='visible', timeout=timeout_for('results_link', 5000))
         trade_data_link.click()
         page.wait_for_load_state('networkidle')   
         logger.info("Navigated to results page successfully")     
         return True
-    except:
+    except Exception as e:
         logger.info("Navigated to results page failed")
+        note_failure('navigate_to_results', e)
         return False
 
 
@@ -29,14 +34,17 @@ def navigate_to_advanced_query(page, logger):
     page.wait_for_load_state('domcontentloaded')
     try:
         advanced_query_menu = page.locator('a.dropdown-toggle:has-text("Advanced Query")').first
-        advanced_query_menu.hover(timeout=5000) 
+        with measure('advanced_query_menu_hover'):
+            advanced_query_menu.hover(timeout=timeout_for('advanced_query_menu_hover', 5000))
         ensure_popup_closed(page, logger)
         trade_data_link = page.locator('#TopMenu1_RawTradeData')
-        trade_data_link.wait_for(state='visible', timeout=5000)
+        with measure('advanced_query_link'):
+            trade_data_link.wait_for(state='visible', timeout=timeout_for('advanced_query_link', 5000))
         trade_data_link.click()
         page.wait_for_load_state('networkidle')        
         return True
-    except:
+    except Exception as e:
+        note_failure('navigate_to_advanced_query', e)
         return False
 
 def select_existing_query(page, query_name, logger):
@@ -45,16 +53,20 @@ def select_existing_query(page, query_name, logger):
     setup_auto_close_popup(page, logger)
     
     dropdown = page.locator('#MainContent_cboExistingQuery')
-    dropdown.wait_for(state='visible', timeout=5000)
+    with measure('existing_query_dropdown'):
+        dropdown.wait_for(state='visible', timeout=timeout_for('existing_query_dropdown', 5000))
     dropdown.click()
     
     options = dropdown.locator('option').all()
     target_value = None
     for option in options:
         text = option.text_content().strip()
-        if query_name in text:
+        # An exact name wins: 'Auto2007' is also a substring of 'Auto2007-2009'.
+        if text == query_name:
             target_value = option.get_attribute('value')
             break
+        if target_value is None and query_name in text:
+            target_value = option.get_attribute('value')
             
     if target_value:
         dropdown.select_option(value=target_value)
@@ -64,10 +76,50 @@ def select_existing_query(page, query_name, logger):
         
         ensure_popup_closed(page, logger)
         proceed_btn = page.locator('#MainContent_btnProceed')
-        proceed_btn.wait_for(state='visible', timeout=5000)
+        with measure('proceed_button'):
+            proceed_btn.wait_for(state='visible', timeout=timeout_for('proceed_button', 5000))
         proceed_btn.click() 
         page.wait_for_load_state('networkidle')
         return True
     
     logger.warning(f"      [NAV] Query '{query_name}' not found in dropdown.")
-    return False
\ No newline at end of file
+    return False
+
+def list_existing_queries(page, logger):
+    """Returns the names of the saved queries offered on the Advanced Query page."""
+    ensure_popup_closed(page, logger)
+    try:
+        dropdown = page.locator('#MainContent_cboExistingQuery')
+        with measure('existing_query_dropdown'):
+            dropdown.wait_for(state='visible', timeout=timeout_for('existing_query_dropdown', 5000))
+        return [text.strip() for text in dropdown.locator('option').all_text_contents() if text.strip()]
+    except Exception as e:
+        logger.warning(f"      [NAV] Could not read saved queries: {e}")
+        return []
+
+
+def read_results_grid(page, logger):
+    """
+    Returns every data row of the first results page as {'id', 'name', 'text'},
+    or None when the grid could not be read.
+    """
+    ensure_popup_closed(page, logger)
+    rows = []
+    try:
+        row_locator = page.locator('#MainContent_QueryViewControl1_grdvQueryList tr')
+        for i in range(row_locator.count()):
+            cells = row_locator.nth(i).locator('td')
+            if cells.count() < 2:
+                continue
+            q_id = cells.nth(0).inner_text().strip()
+            if not q_id.isdigit():
+                continue
+            rows.append({
+                'id': q_id,
+                'name': cells.nth(1).inner_text().strip(),
+                'text': row_locator.nth(i).inner_text(),
+            })
+    except Exception as e:
+        logger.warning(f"      [NAV] Could not read results grid: {e}")
+        return None
+    return rows
@@ -1,9 +1,13 @@
 from src.wits.handlers import setup_auto_close_popup
 from src.wits.handlers import ensure_popup_closed
+from src.utils.timeouts import measure, timeout_for
+from src.utils.capture import note_failure
 
-def modify_reporter(page, query_name, logger, country_code, country_name):
+def modify_reporter(page, query_name, logger, country_code, country_name, item_id=None):
     """
     Handles the modification of the Reporter tab to select a specific country.
+    `item_id` is the exact Country List id from the catalogue; when given,
+    the selection is verified with that single lookup.
     """
     logger.info(f"Modifying Reporter for country code: {country_code}")
     
@@ -15,9 +19,11 @@ def modify_reporter(page, query_name, logger, country_code, country_name):
     try:
         # Wait for modify link to be visible (max 10s)
         # This handles cases where the page takes a moment to settle after potential popup closure
-        modify_link.wait_for(state='visible', timeout=5000)
-    except:
+        with measure('modify_link'):
+            modify_link.wait_for(state='visible', timeout=timeout_for('modify_link', 5000))
+    except Exception as e:
         logger.warning("Modify link wait timed out. proceeding to check visibility...")
+        note_failure('modify_link', e)
         return False
     if modify_link.is_visible():
         logger.info("\n" + "="*50)
@@ -30,19 +36,19 @@ def modify_reporter(page, query_name, logger, country_code, country_name):
             dialog.accept()
         
         page.on("dialog", handle_dialog)
-        
-        # Click the link
-        logger.info("-> Clicking 'Modify' link...")
-        modify_link.click()
-        
-        # Wait for the WITS RadWindow to appear
-        page.wait_for_load_state('networkidle')
-        #page.wait_for_timeout(500)
-        
-        ensure_popup_closed(page, logger) # Check after modal opens
-
-        # Cleanup dialog handler
-        page.remove_listener("dialog", handle_dialog)
+        try:
+            # Click the link
+            logger.info("-> Clicking 'Modify' link...")
+            modify_link.click()
+            
+            # Wait for the WITS RadWindow to appear
+            page.wait_for_load_state('networkidle')
+            #page.wait_for_timeout(500)
+            
+            ensure_popup_closed(page, logger) # Check after modal opens
+        finally:
+            # Cleanup dialog handler, also when the click or wait raised
+            page.remove_listener("dialog", handle_dialog)
         
         # ---------------------------------------------------------
         # MODAL HANDLING (Country List / New Query)
@@ -58,6 +64,7 @@ def modify_reporter(page, query_name, logger, country_code, country_name):
                 try:
                     iframe.locator('a.clearall, input[value="Clear All"]').click()
                 except Exception as e:
+                    note_failure('country_list_clear', e)
                     return False
                 page.wait_for_timeout(300)
                 
@@ -73,18 +80,20 @@ def modify_reporter(page, query_name, logger, country_code, country_name):
                 page.wait_for_timeout(1000) # Wait for add to process
                 
                 # --- VERIFICATION LOGIC ---
-                expected_id = f"{country_name} -- {country_code}"
+                expected_id = item_id or f"{country_name} -- {country_code}"
                 
                 verified = False
                 try:
                     # 1. Exact ID Match (Primary)
-                    selected_item = iframe.locator(f"li.list-item[id='{expected_id}']")
+                    css_id = expected_id.replace('\\', '\\\\').replace('"', '\\"')
+                    selected_item = iframe.locator(f'li.list-item[id="{css_id}"]')
                     if selected_item.count() > 0 and selected_item.is_visible():
                          verified = True
                          logger.info(f"      [SUCCESS] Found Exact ID Match: '{expected_id}'")
                     
                     # 2. Fallback: Text Match (for special chars like 'Åland')
-                    if not verified:
+                    # A catalogue id is authoritative, so the fallbacks are skipped.
+                    if not verified and item_id is None:
                          logger.info("      [INFO] strict ID match failed. Checking Name Text...")
                          # Try matching just the name part carefully
                          fallback_name = iframe.locator(f"li.list-item:has-text('{country_name}')")
@@ -93,7 +102,7 @@ def modify_reporter(page, query_name, logger, country_code, country_name):
                             logger.info(f"      [SUCCESS] Found Name Text Match: '{country_name}'")
                             click_cancel(page, logger)
                     # 3. Fallback: ISO Code Match (Robust for encoding issues)
-                    if not verified:
+                    if not verified and item_id is None:
                          logger.info("      [INFO] Name match failed. Checking ISO Suffix...")
                          # Look for " -- ISO" pattern which is standard
                          iso_pattern = f" -- {country_code}"
@@ -103,9 +112,11 @@ def modify_reporter(page, query_name, logger, country_code, country_name):
                             logger.info(f"      [SUCCESS] Found ISO Suffix Match: '{iso_pattern}'")
                             click_cancel(page, logger)
                 except Exception as e:
+                    note_failure('country_list_verify', e)
                     return False
                 if not verified:
                     logger.error(f"      [FAILURE] Could not verify selection for '{country_name}' ({country_code}).")
+                    note_failure('country_list_verify')
                     
                     try:
                         click_cancel(page, logger)
@@ -143,9 +154,7 @@ def modify_reporter(page, query_name, logger, country_code, country_name):
         return True
     else:
         logger.error("Modify link not found or obscured.")
-        try:
-             page.screenshot(path='modify_link_error.png')
-        except: pass
+        note_failure('modify_link')
         return False
 
 